@@ -39,6 +39,16 @@ agent_db = get_postgres_db()
 # ---------------------------------------------------------------------------
 
 
+def _client_row(c: dict) -> str:
+    d = c.get("discount_percent", 0)
+    dl = c.get("discount_orders_left", 0)
+    discount = f", discount: {d}% ({dl} orders left)" if d and dl else ""
+    return (
+        f"- {c['email']} | {c['name']} | {c['payment_type']}"
+        f" | zelle: {c.get('zelle_address') or 'none'}{discount}"
+    )
+
+
 def list_clients() -> str:
     """List all clients in the database.
     Returns a formatted table of all clients with their details.
@@ -47,18 +57,7 @@ def list_clients() -> str:
     if not clients:
         return "No clients in database."
 
-    lines = [f"Total clients: {len(clients)}", ""]
-    for c in clients:
-        discount = ""
-        d = c.get("discount_percent", 0)
-        dl = c.get("discount_orders_left", 0)
-        if d and dl:
-            discount = f", discount: {d}% ({dl} orders left)"
-        lines.append(
-            f"- {c['email']} | {c['name']} | {c['payment_type']}"
-            f" | zelle: {c.get('zelle_address') or 'none'}{discount}"
-        )
-    return "\n".join(lines)
+    return f"Total clients: {len(clients)}\n\n" + "\n".join(_client_row(c) for c in clients)
 
 
 def get_client(email: str) -> str:
@@ -5,12 +5,15 @@ Email Classifier
 LLM classifier agent, context builder, and classification runner.
 """
 
+import hashlib
 import json
 import logging
 import re
+import threading
 
 from agno.agent import Agent
 from agno.models.openai import OpenAIResponses
+from cachetools import TTLCache
 
 from agents.formatters import compose_classifier_context, format_client_order_context, format_thread_for_classifier
 from agents.models import EmailClassification, OrderItem
@@ -253,12 +256,21 @@ Field rules:
 - order_items[].strict_region: boolean, default false
 
 CRITICAL: Return a FLAT JSON object with exactly these field names. No extra nesting beyond order_items array.
+When the input holds several ---EMAIL n--- blocks, return {"results": [...]} instead: one such flat object
+per block, in block order.
 """
 
+# The instructions (~3k tokens) are a static prefix of every classifier
+# request; a fixed prompt_cache_key keeps these requests on the same
+# OpenAI prompt-cache shard so the prefix is billed/processed as cached.
+# Keep classifier_instructions free of per-request content.
 classifier_agent = Agent(
     id="email-classifier",
     name="Email Classifier",
-    model=OpenAIResponses(id="gpt-5-mini"),
+    model=OpenAIResponses(
+        id="gpt-5-mini",
+        request_params={"prompt_cache_key": "email-classifier"},
+    ),
     instructions=classifier_instructions,
 )
 
@@ -267,19 +279,57 @@ classifier_agent = Agent(
 # Helpers
 # ---------------------------------------------------------------------------
 
-def _find_value(data: dict, *keys: str):
-    """Search for a value by multiple possible key names, including nested dicts."""
-    # First: check top-level keys
-    for key in keys:
-        if key in data and data[key] is not None:
-            return data[key]
-    # Fallback: search one level deep in nested dicts
+# Classifier JSON field names: canonical field -> accepted names, in priority
+# order (expected name first, then common LLM variations).
+_FIELD_NAMES: dict[str, tuple[str, ...]] = {
+    "needs_reply": ("needs_reply",),
+    "situation": ("situation", "classification", "category"),
+    "client_email": ("client_email", "real_customer_email", "customer_email", "email"),
+    "client_name": ("client_name", "customer_name", "name", "firstname"),
+    "order_id": ("order_id", "order_number"),
+    "price": ("price", "payment_amount", "total", "amount"),
+    "customer_street": ("customer_street", "street", "street_address", "address"),
+    "customer_city_state_zip": ("customer_city_state_zip", "city_state_zip"),
+    "items": ("items", "products"),
+    "order_items": ("order_items", "structured_items"),
+    "followup_to": ("followup_to",),
+    "dialog_intent": ("dialog_intent",),
+}
+
+# Accepted name -> (canonical field, rank); lower rank wins.
+_FIELD_ALIASES: dict[str, tuple[str, int]] = {
+    name: (field, rank)
+    for field, names in _FIELD_NAMES.items()
+    for rank, name in enumerate(names)
+}
+
+
+def _pick_fields(d: dict) -> dict:
+    """Canonical field -> value for one dict level (best-ranked non-None name)."""
+    best: dict[str, tuple[int, object]] = {}
+    for key, value in d.items():
+        alias = _FIELD_ALIASES.get(key)
+        if alias is None or value is None:
+            continue
+        field, rank = alias
+        if field not in best or rank < best[field][0]:
+            best[field] = (rank, value)
+    return {field: value for field, (_, value) in best.items()}
+
+
+def _normalize(data: dict) -> dict:
+    """Map classifier JSON onto canonical field names in one walk.
+
+    Top-level keys win; otherwise the first nested dict (one level deep)
+    that has the field is used. Within a level, the earlier name in
+    _FIELD_NAMES wins. None values are treated as missing.
+    """
+    fields = _pick_fields(data)
     for v in data.values():
         if isinstance(v, dict):
-            for key in keys:
-                if key in v and v[key] is not None:
-                    return v[key]
-    return None
+            for field, value in _pick_fields(v).items():
+                fields.setdefault(field, value)
+    return fields
 
 
 _EMAIL_RE = re.compile(r'[a-zA-Z0-9_.+-]+@[a-zA-Z0-9-]+\.[a-zA-Z0-9-.]+')
@@ -794,24 +844,64 @@ def _build_order_items_from_last_order(last_order: dict) -> list[OrderItem]:
 # Classification runner
 # ---------------------------------------------------------------------------
 
-def run_classification(
-    email_text: str,
-    context_str: str,
-    conversation_state: dict | None = None,
-    last_order: dict | None = None,
-) -> EmailClassification:
-    """Run deterministic parser or LLM classifier to produce an EmailClassification.
+# ---------------------------------------------------------------------------
+# Classifier response cache
+# ---------------------------------------------------------------------------
+# Keyed by SHA-256 of the full classifier input (context + cleaned email), so
+# a hit only happens when the LLM would see exactly the same prompt — e.g. the
+# same message re-processed after a failed run. Thread state and history are
+# part of the prompt, so identical bodies from different conversations never
+# share a classification. Only responses that produced a valid classification
+# are stored, and a manual re-trigger (bypass_cache) asks the LLM again.
+_CLASSIFIER_CACHE_MAXSIZE = 256
+_CLASSIFIER_CACHE_TTL = 3600  # seconds
+
+_classifier_cache: TTLCache = TTLCache(maxsize=_CLASSIFIER_CACHE_MAXSIZE, ttl=_CLASSIFIER_CACHE_TTL)
+_classifier_cache_lock = threading.Lock()
+_classifier_cache_stats = {"hits": 0, "misses": 0}
+
+
+def _classifier_cache_key(classifier_input: str) -> str:
+    return hashlib.sha256(classifier_input.encode("utf-8")).hexdigest()
+
+
+def _get_cached_classification(cache_key: str) -> str | None:
+    """Return the cached raw LLM response for cache_key, or None."""
+    with _classifier_cache_lock:
+        raw = _classifier_cache.get(cache_key)
+        if raw is None:
+            _classifier_cache_stats["misses"] += 1
+        else:
+            _classifier_cache_stats["hits"] += 1
+        hits, misses = _classifier_cache_stats["hits"], _classifier_cache_stats["misses"]
+    logger.info(
+        "Classifier cache %s (key=%s, hits=%d, misses=%d)",
+        "hit" if raw is not None else "miss", cache_key[:12], hits, misses,
+    )
+    return raw
 
-    Args:
-        email_text: Original email text (used by deterministic parser).
-        context_str: Classifier context prepended before the new email.
-        conversation_state: Structured state dict for Python post-corrections
-            (region inference). Optional — backwards compatible.
-        last_order: Last order dict from get_last_order(), used for
-            deterministic reorder detection. Optional — backwards compatible.
 
-    Returns:
-        Validated EmailClassification instance.
+def _store_cached_classification(cache_key: str, raw: str) -> None:
+    with _classifier_cache_lock:
+        _classifier_cache[cache_key] = raw
+
+
+def _reset_classifier_cache() -> None:
+    """Clear cached classifier responses and counters. Used in tests."""
+    with _classifier_cache_lock:
+        _classifier_cache.clear()
+        _classifier_cache_stats["hits"] = 0
+        _classifier_cache_stats["misses"] = 0
+
+
+def _classify_deterministic(
+    email_text: str,
+    conversation_state: dict | None,
+    last_order: dict | None,
+) -> EmailClassification | None:
+    """Zero-token classification paths (website order, payment ack, reorder).
+
+    Returns None when the email needs the LLM classifier.
     """
     # Step 0.9: Try deterministic parsing for website orders (0 tokens)
     parsed_classification = try_parse_order(email_text)
@@ -865,26 +955,51 @@ def run_classification(
             )
         # No sender or no order history → fall through to LLM
 
+    return None
+
+
+def _build_classifier_input(email_text: str, context_str: str) -> str:
+    """Classifier prompt for one email: context + cleaned body."""
     # Clean email body for LLM classifier (remove quoted blocks, signatures)
     cleaned_email = clean_email_body(email_text)
-
-    # Step 1: LLM classifies (returns JSON text)
-    logger.info("Classifying email...")
-    classifier_input = (
+    return (
         context_str + "--- NEW EMAIL ---\n" + cleaned_email
         if context_str
         else cleaned_email
     )
-    response = classifier_agent.run(classifier_input)
-    raw = response.content
 
-    # Parse JSON from LLM response (strip markdown code fences if present)
-    json_str = re.sub(r"^```json\s*|\s*```$", "", raw.strip())
-    data = json.loads(json_str)
 
-    # Robust field extraction: try expected names + common LLM variations + nested
+# Markdown code fence around the JSON answer (```json ... ``` or ``` ... ```)
+_FENCE_RE = re.compile(r"^```(?:json)?\s*|\s*```$")
+
+
+def _parse_llm_json(raw: str):
+    """Parse JSON from LLM response (strip markdown code fences if present)."""
+    json_str = _FENCE_RE.sub("", raw.strip())
+    return json.loads(json_str)
+
+
+def _run_classifier(classifier_input: str) -> tuple[dict, str]:
+    """Call the classifier LLM for one email. Returns (parsed JSON, raw reply)."""
+    raw = classifier_agent.run(classifier_input).content
+    return _parse_llm_json(raw), raw
+
+
+def _classification_from_llm_data(
+    data: dict,
+    email_text: str,
+    conversation_state: dict | None,
+) -> EmailClassification:
+    """Build an EmailClassification from the classifier's JSON object.
+
+    Applies Python post-corrections (sender email, fallback_for, region
+    inference, items text) on top of the LLM fields.
+    """
+    # Robust field extraction: expected names + common LLM variations + nested
+    fields = _normalize(data)
+
     # Parse order_items (structured list) before building classification
-    raw_order_items = _find_value(data, "order_items", "structured_items")
+    raw_order_items = fields.get("order_items")
     order_items_parsed = None
     if raw_order_items and isinstance(raw_order_items, list):
         try:
@@ -908,18 +1023,18 @@ def run_classification(
             order_items_parsed = None
 
     classification = EmailClassification(
-        needs_reply=_find_value(data, "needs_reply") if _find_value(data, "needs_reply") is not None else True,
-        situation=_find_value(data, "situation", "classification", "category") or "other",
-        client_email=_find_value(data, "client_email", "real_customer_email", "customer_email", "email") or "",
-        client_name=_find_value(data, "client_name", "customer_name", "name", "firstname"),
-        order_id=_find_value(data, "order_id", "order_number"),
-        price=_find_value(data, "price", "payment_amount", "total", "amount"),
-        customer_street=_find_value(data, "customer_street", "street", "street_address", "address"),
-        customer_city_state_zip=_find_value(data, "customer_city_state_zip", "city_state_zip"),
-        items=_find_value(data, "items", "products"),
+        needs_reply=fields.get("needs_reply", True),
+        situation=fields.get("situation") or "other",
+        client_email=fields.get("client_email") or "",
+        client_name=fields.get("client_name"),
+        order_id=fields.get("order_id"),
+        price=fields.get("price"),
+        customer_street=fields.get("customer_street"),
+        customer_city_state_zip=fields.get("customer_city_state_zip"),
+        items=fields.get("items"),
         order_items=order_items_parsed,
-        followup_to=_find_value(data, "followup_to"),
-        dialog_intent=_find_value(data, "dialog_intent"),
+        followup_to=fields.get("followup_to"),
+        dialog_intent=fields.get("dialog_intent"),
     )
 
     # Python client_email is source of truth — always overrides LLM extraction.
@@ -948,3 +1063,144 @@ def run_classification(
         classification.client_email, classification.situation, classification.needs_reply,
     )
     return classification
+
+
+def run_classification(
+    email_text: str,
+    context_str: str,
+    conversation_state: dict | None = None,
+    last_order: dict | None = None,
+    bypass_cache: bool = False,
+) -> EmailClassification:
+    """Run deterministic parser or LLM classifier to produce an EmailClassification.
+
+    Args:
+        email_text: Original email text (used by deterministic parser).
+        context_str: Classifier context prepended before the new email.
+        conversation_state: Structured state dict for Python post-corrections
+            (region inference). Optional — backwards compatible.
+        last_order: Last order dict from get_last_order(), used for
+            deterministic reorder detection. Optional — backwards compatible.
+        bypass_cache: Ignore a cached LLM response (manual reprocess). The
+            fresh response replaces it.
+
+    Returns:
+        Validated EmailClassification instance.
+    """
+    classification = _classify_deterministic(email_text, conversation_state, last_order)
+    if classification:
+        return classification
+
+    # Step 1: LLM classifies (returns JSON text)
+    logger.info("Classifying email...")
+    classifier_input = _build_classifier_input(email_text, context_str)
+    cache_key = _classifier_cache_key(classifier_input)
+    raw = None if bypass_cache else _get_cached_classification(cache_key)
+    if raw is not None:
+        return _classification_from_llm_data(_parse_llm_json(raw), email_text, conversation_state)
+
+    data, raw = _run_classifier(classifier_input)
+    classification = _classification_from_llm_data(data, email_text, conversation_state)
+    # Stored only once it validated — a malformed reply is retried next time
+    _store_cached_classification(cache_key, raw)
+    return classification
+
+
+# ---------------------------------------------------------------------------
+# Batch classification
+# ---------------------------------------------------------------------------
+# Several emails that need the LLM are sent in ONE classifier call and the
+# model returns a JSON array. This saves per-request overhead and RPM budget
+# when the poller picks up a burst of messages. Chunks are capped so a single
+# call stays fast and a bad answer costs at most one chunk of retries.
+BATCH_CLASSIFY_MAX = 8
+
+_BATCH_HEADER = """\
+Classify each email below INDEPENDENTLY, applying all rules above to each one.
+Every email block carries its own context — never mix facts between blocks.
+Return ONLY {{"results": [...]}} with exactly {count} flat JSON objects in the
+array, one per email, in the same order as the blocks. No text before or after.
+
+"""
+
+
+def _build_batch_input(classifier_inputs: list[str]) -> str:
+    blocks = "\n\n".join(
+        f"---EMAIL {n}---\n{text}" for n, text in enumerate(classifier_inputs, 1)
+    )
+    return _BATCH_HEADER.format(count=len(classifier_inputs)) + blocks
+
+
+def _run_classifier_batch(classifier_inputs: list[str]) -> list[dict] | None:
+    """One LLM call for several emails. None if the answer has the wrong shape."""
+    try:
+        response = classifier_agent.run(_build_batch_input(classifier_inputs))
+        data = _parse_llm_json(response.content)
+    except Exception as e:
+        logger.warning("Batch classification failed (%d emails): %s", len(classifier_inputs), e)
+        return None
+
+    # {"results": [...]} as instructed; a bare array is accepted as well
+    if isinstance(data, dict):
+        data = data.get("results")
+    if (
+        not isinstance(data, list)
+        or len(data) != len(classifier_inputs)
+        or not all(isinstance(item, dict) for item in data)
+    ):
+        logger.warning(
+            "Batch classification returned unexpected shape (expected %d objects), "
+            "falling back to per-email calls",
+            len(classifier_inputs),
+        )
+        return None
+    return data
+
+
+def run_classification_batch(
+    requests: list[tuple[str, str, dict | None, dict | None]],
+) -> list[EmailClassification]:
+    """Classify several emails, sharing LLM calls where possible.
+
+    Each request is (email_text, context_str, conversation_state, last_order)
+    — the same arguments as run_classification(). Deterministic paths and
+    cached responses are used first; the remaining emails are classified in
+    chunks of up to BATCH_CLASSIFY_MAX per LLM call. A chunk whose answer
+    can't be matched back to its emails falls back to one call per email.
+
+    Returns:
+        EmailClassification list in the same order as requests.
+    """
+    results: list[EmailClassification | None] = [None] * len(requests)
+    pending: list[tuple[int, str, str]] = []  # (index, classifier_input, cache_key)
+
+    for i, (email_text, context_str, conversation_state, last_order) in enumerate(requests):
+        classification = _classify_deterministic(email_text, conversation_state, last_order)
+        if classification:
+            results[i] = classification
+            continue
+        classifier_input = _build_classifier_input(email_text, context_str)
+        cache_key = _classifier_cache_key(classifier_input)
+        raw = _get_cached_classification(cache_key)
+        if raw is not None:
+            results[i] = _classification_from_llm_data(
+                _parse_llm_json(raw), email_text, conversation_state,
+            )
+        else:
+            pending.append((i, classifier_input, cache_key))
+
+    for start in range(0, len(pending), BATCH_CLASSIFY_MAX):
+        chunk = pending[start:start + BATCH_CLASSIFY_MAX]
+        logger.info("Classifying %d email(s) in one call...", len(chunk))
+        batch_data = _run_classifier_batch([c[1] for c in chunk]) if len(chunk) > 1 else None
+        for pos, (i, classifier_input, cache_key) in enumerate(chunk):
+            email_text, _, conversation_state, _ = requests[i]
+            if batch_data is not None:
+                data = batch_data[pos]
+                raw = json.dumps(data, ensure_ascii=False)
+            else:
+                data, raw = _run_classifier(classifier_input)
+            results[i] = _classification_from_llm_data(data, email_text, conversation_state)
+            _store_cached_classification(cache_key, raw)
+
+    return results
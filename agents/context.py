@@ -137,6 +137,43 @@ class EmailContext:
     extra: dict = field(default_factory=dict)
 
 
+# ---------------------------------------------------------------------------
+# Email history (with optional prefetch)
+# ---------------------------------------------------------------------------
+def history_key(gmail_thread_id: str | None, client_email: str | None) -> tuple:
+    """Identify which history load_history() returns for these arguments."""
+    if gmail_thread_id:
+        return ("thread", gmail_thread_id)
+    return ("client", client_email or "")
+
+
+def load_history(gmail_thread_id: str | None, client_email: str | None) -> list[dict]:
+    """Email history for handler context — prefer thread-specific when available."""
+    if gmail_thread_id:
+        return get_full_thread_history(gmail_thread_id, max_results=10)
+    return get_full_email_history(client_email, max_results=10)
+
+
+def _take_prefetched_history(prefetch, key: tuple) -> list[dict] | None:
+    """Result of a background load_history() started by the pipeline before routing.
+
+    prefetch is (history_key, Future) stored by the pipeline in
+    result["history_prefetch"]. Returns None (caller loads synchronously)
+    when there is no prefetch, it was for another thread/client, or it failed.
+    """
+    if not prefetch:
+        return None
+    prefetch_key, future = prefetch
+    if prefetch_key != key:
+        logger.info("History prefetch discarded: %s != %s", prefetch_key, key)
+        return None
+    try:
+        return future.result()
+    except Exception as e:
+        logger.warning("History prefetch failed, loading synchronously: %s", e)
+        return None
+
+
 # ---------------------------------------------------------------------------
 # Build and format context
 # ---------------------------------------------------------------------------
@@ -209,11 +246,12 @@ def build_context(
         except Exception as e:
             logger.warning("Failed to load cross-thread states: %s", e)
 
-    # Email history — prefer thread-specific when gmail_thread_id available
-    if gmail_thread_id:
-        history = get_full_thread_history(gmail_thread_id, max_results=10)
-    else:
-        history = get_full_email_history(client_email, max_results=10)
+    # Email history — reuse the pipeline's prefetch if it was for the same
+    # thread/client
+    key = history_key(gmail_thread_id, client_email)
+    history = _take_prefetched_history(result.get("history_prefetch"), key)
+    if history is None:
+        history = load_history(gmail_thread_id, client_email)
     history_text = format_email_history(history)
 
     # Policy rules
@@ -13,7 +13,7 @@ import logging
 from agno.agent import Agent
 from agno.models.openai import OpenAIResponses
 
-from agents.pipeline import classify_and_process  # noqa: F401 — re-export for gmail_poller
+from agents.pipeline import classify_and_process, classify_and_process_batch  # noqa: F401 — re-export for gmail_poller
 from db import get_postgres_db
 
 logger = logging.getLogger(__name__)
@@ -33,6 +33,9 @@ When a user gives you an email to process:
 1. Call the `classify_and_process` tool.
 2. Copy the tool output to the user EXACTLY as-is. Do not change a single character.
 
+When a user gives you several emails at once, call `classify_and_process_batch`
+once with all of them and copy each result in order, separated by a blank line.
+
 ABSOLUTE RULES:
 - Copy the ENTIRE tool output verbatim — every line, every symbol, every space.
 - Do NOT rephrase, summarize, reformat, or restructure the output.
@@ -48,7 +51,7 @@ email_agent = Agent(
     model=OpenAIResponses(id="gpt-5.2"),
     db=agent_db,
     instructions=email_agent_instructions,
-    tools=[classify_and_process],
+    tools=[classify_and_process, classify_and_process_batch],
     enable_agentic_memory=True,
     add_datetime_to_context=True,
     add_history_to_context=True,
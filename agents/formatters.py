@@ -8,28 +8,22 @@ Used by both production code and eval runner.
 import json
 
 
+def _history_entry(msg: dict) -> str:
+    """One history message: direction/date/subject line, body (max 300 chars), separator."""
+    ts = msg["created_at"].strftime("%Y-%m-%d") if msg.get("created_at") else "unknown"
+    who = "[CLIENT WROTE]" if msg["direction"] == "inbound" else "[WE SENT]"
+    body = msg.get("body", "")
+    if len(body) > 300:
+        body = f"{body[:300]}..."
+    return f"{who} {ts} | {msg.get('subject', '')}\n{body}\n---"
+
+
 def format_email_history(history: list[dict]) -> str:
     """Format email history for inclusion in the fallback LLM prompt."""
     if not history:
         return ""
 
-    lines = ["=== CONVERSATION HISTORY ===", ""]
-    for msg in history:
-        ts = msg["created_at"].strftime("%Y-%m-%d") if msg.get("created_at") else "unknown"
-        if msg["direction"] == "inbound":
-            prefix = f"[CLIENT WROTE] {ts} | {msg.get('subject', '')}"
-        else:
-            prefix = f"[WE SENT] {ts} | {msg.get('subject', '')}"
-
-        body = msg.get("body", "")
-        if len(body) > 300:
-            body = body[:300] + "..."
-
-        lines.append(prefix)
-        lines.append(body)
-        lines.append("---")
-
-    return "\n".join(lines)
+    return "=== CONVERSATION HISTORY ===\n\n" + "\n".join(_history_entry(msg) for msg in history)
 
 
 def format_thread_for_classifier(history: list[dict]) -> str:
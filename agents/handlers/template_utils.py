@@ -2,17 +2,57 @@
 
 import html as html_mod
 import logging
+import re
+from functools import lru_cache
 
 from agents.reply_templates import REPLY_TEMPLATES
 from db.memory import decrement_discount
 
 logger = logging.getLogger(__name__)
 
+_PLACEHOLDER_RE = re.compile(r"\{([A-Z_]+)\}")
+
 
 # ---------------------------------------------------------------------------
 # Shared helpers
 # ---------------------------------------------------------------------------
 
+@lru_cache(maxsize=128)
+def _parse_template(template: str) -> tuple[tuple[str, ...], frozenset[str]]:
+    """Split a template once: (literal, NAME, literal, NAME, ..., literal), names."""
+    parts = tuple(_PLACEHOLDER_RE.split(template))
+    return parts, frozenset(parts[1::2])
+
+
+def _fill_placeholders(template: str, values: dict[str, str]) -> str:
+    """Substitute {NAME} placeholders; unknown names are left as is."""
+    parts = list(_parse_template(template)[0])
+    for i in range(1, len(parts), 2):
+        name = parts[i]
+        parts[i] = values.get(name, f"{{{name}}}")
+    return "".join(parts)
+
+
+_PRICE_STRIP = str.maketrans("", "", "$,")
+
+
+def _parse_price_cents(price: str) -> int:
+    """"$1,234.50" → 123450; 0 when the price is missing or not a number."""
+    try:
+        return round(float(price.translate(_PRICE_STRIP)) * 100)
+    except (ValueError, TypeError, AttributeError, OverflowError):
+        return 0
+
+
+def _apply_discount_cents(cents: int, discount_percent: int) -> int:
+    """Discounted amount in cents, rounded half-up to the cent."""
+    return (cents * (100 - discount_percent) + 50) // 100
+
+
+def _format_cents(cents: int) -> str:
+    return f"${cents // 100}.{cents % 100:02d}"
+
+
 def _get_clean_body(email_text: str) -> str:
     """Extract and clean body for keyword matching.
 
@@ -177,15 +217,17 @@ def fill_template_reply(
         calc = result.get("calculated_price")
         price = f"${calc:.2f}" if calc is not None else ""
 
+    placeholders = _parse_template(template)[1]
+
     # Guard: template requires price but none available → skip template
-    if "{PRICE}" in template and not price:
+    if "PRICE" in placeholders and not price:
         logger.warning(
             "Template requires {PRICE} but no price available for %s — skipping",
             classification.client_email,
         )
         return result, False
 
-    if "{FINAL_PRICE}" in template and not price:
+    if "FINAL_PRICE" in placeholders and not price:
         logger.warning(
             "Template requires {FINAL_PRICE} but no price for %s — skipping",
             classification.client_email,
@@ -197,7 +239,7 @@ def fill_template_reply(
     zelle_address = client.get("zelle_address", "")
 
     # Guard: template requires Zelle address but empty → skip
-    if "{ZELLE_ADDRESS}" in template and not zelle_address:
+    if "ZELLE_ADDRESS" in placeholders and not zelle_address:
         logger.warning(
             "Template requires {ZELLE_ADDRESS} but empty for %s — skipping",
             classification.client_email,
@@ -205,7 +247,7 @@ def fill_template_reply(
         return result, False
 
     # Guard: template requires RECHECK_DATE but no reliable ship date → skip
-    if "{RECHECK_DATE}" in template:
+    if "RECHECK_DATE" in placeholders:
         state = result.get("conversation_state") or {}
         facts = state.get("facts") or {}
         recheck = _calc_recheck_date(
@@ -222,39 +264,37 @@ def fill_template_reply(
     else:
         recheck = None
 
-    price_clean = price.replace("$", "").replace(",", "")
-    try:
-        price_num = float(price_clean)
-    except (ValueError, TypeError):
-        price_num = 0.0
+    price_cents = _parse_price_cents(price)
 
     apply_discount = (
         situation == "new_order"
         and discount > 0
         and discount_left > 0
-        and price_num > 0
+        and price_cents > 0
     )
     if apply_discount:
-        final_price = f"${price_num * (1 - discount / 100):.2f}"
+        final_price = _format_cents(_apply_discount_cents(price_cents, discount))
         discount_str = str(discount)
     else:
         final_price = price
         discount_str = str(discount) if discount > 0 else "0"
 
-    reply = template
-    reply = reply.replace("{PRICE}", price)
-    reply = reply.replace("{DISCOUNT}", discount_str)
-    reply = reply.replace("{FINAL_PRICE}", final_price)
-    reply = reply.replace("{ZELLE_ADDRESS}", zelle_address)
-    reply = reply.replace("{CUSTOMER_NAME}", classification.client_name or client["name"])
     street = classification.customer_street or client.get("street", "")
     city_zip = classification.customer_city_state_zip or client.get("city_state_zip", "")
-    reply = reply.replace("{CUSTOMER_STREET}", street)
-    reply = reply.replace("{CUSTOMER_CITY_STATE_ZIP}", city_zip)
-    reply = reply.replace("{TRACKING_URL}", "[tracking URL pending]")
-    reply = reply.replace("{DISCOUNT_ORDERS_LEFT}", str(discount_left))
+    values = {
+        "PRICE": price,
+        "DISCOUNT": discount_str,
+        "FINAL_PRICE": final_price,
+        "ZELLE_ADDRESS": zelle_address,
+        "CUSTOMER_NAME": classification.client_name or client["name"],
+        "CUSTOMER_STREET": street,
+        "CUSTOMER_CITY_STATE_ZIP": city_zip,
+        "TRACKING_URL": "[tracking URL pending]",
+        "DISCOUNT_ORDERS_LEFT": str(discount_left),
+    }
     if recheck:
-        reply = reply.replace("{RECHECK_DATE}", recheck)
+        values["RECHECK_DATE"] = recheck
+    reply = _fill_placeholders(template, values)
 
     if not apply_discount and price:
         reply = reply.replace(f"{price} - 0% = {price}", price)
@@ -12,12 +12,20 @@ All Telegram side-effects are delegated to agents.notifier.
 """
 
 import logging
+import re
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import datetime, timezone
 
 from agents.checker import check_reply
-from agents.classifier import build_classifier_context, run_classification
-from agents.context import load_policy
+from agents.classifier import (
+    _extract_sender_email,
+    build_classifier_context,
+    run_classification,
+    run_classification_batch,
+)
+from agents.context import history_key, load_history, load_policy
 from agents.formatters import format_hold_result, format_result
+from agents.handlers import handle_general, handle_oos_followup
 from agents.notifier import (
     build_oos_message,
     notify_checker_issues,
@@ -26,7 +34,7 @@ from agents.notifier import (
     notify_price_alerts,
     notify_reply_ready,
 )
-from agents.router import route_to_handler
+from agents.router import SITUATION_HANDLERS, route_to_handler
 import agents.state_updater as state_updater
 from agents.state_updater import update_conversation_state
 from db.conversation_state import save_state
@@ -37,7 +45,7 @@ from db.memory import (
     get_stock_summary,
     replace_order_items,
     resolve_order_items,
-    save_email,
+    save_emails_bulk,
     save_order_items,
     select_best_alternatives,
     update_client,
@@ -48,6 +56,14 @@ from utils.telegram import send_telegram
 
 logger = logging.getLogger(__name__)
 
+# Worker pool for network I/O that can overlap the main pipeline thread
+# (Gmail API round-trips). Small on purpose: emails are processed one at a
+# time by the poller, so only a couple of tasks are ever in flight.
+_IO_POOL = ThreadPoolExecutor(max_workers=4, thread_name_prefix="pipeline-io")
+
+# Handlers that read email history through build_context()
+_HISTORY_HANDLERS = (handle_general, handle_oos_followup)
+
 # Phase D: statuses where the order cycle is still active
 # (safe to reuse order_id, no state reset on new_order)
 _ACTIVE_ORDER_STATUSES = {"new", "awaiting_oos_decision", "pending_response"}
@@ -67,6 +83,18 @@ _FINAL_CONFIRMATION_TEMPLATES = {
 }
 
 
+# First "Subject:" header line (case-insensitive, must start the line)
+_SUBJECT_RE = re.compile(r"^subject:(.*)$", re.IGNORECASE | re.MULTILINE)
+# Headers come first; a missing Subject must not scan a long forwarded body.
+_HEADER_WINDOW = 2048
+
+
+def _extract_subject(email_text: str) -> str:
+    """Subject from the email text headers, or "" if there is none."""
+    m = _SUBJECT_RE.search(email_text, 0, _HEADER_WINDOW)
+    return m.group(1).strip() if m else ""
+
+
 def _items_text(order_items) -> str | None:
     """Rebuild free-text items summary from order_items list."""
     if not order_items:
@@ -341,16 +369,30 @@ def _apply_confirmed_subset_result(
     ]
 
 
+def _lookup_client(client_email: str, prefetch: tuple[str, Future] | None) -> dict | None:
+    """get_client(), reusing the speculative lookup when it was for this email."""
+    if prefetch:
+        prefetch_email, future = prefetch
+        if prefetch_email == (client_email or "").lower().strip():
+            try:
+                return future.result()
+            except Exception as e:
+                logger.warning("Client prefetch failed, querying synchronously: %s", e)
+    return get_client(client_email)
+
+
 def process_classified_email(
     classification,
     gmail_message_id: str | None = None,
     gmail_thread_id: str | None = None,
     gmail_account: str = "default",
+    client_prefetch: tuple[str, Future] | None = None,
 ) -> dict:
     """Process a classified email: classify metadata and prepare router context.
 
     This function uses ZERO tokens and does not generate text replies.
     It prepares client/stock context and signals whether routing is needed.
+    client_prefetch is the (email, Future) from _start_client_prefetch().
     """
     result = {
         "needs_reply": classification.needs_reply,
@@ -366,7 +408,7 @@ def process_classified_email(
     }
 
     # Look up client via memory layer (always — even if no reply needed)
-    client = get_client(classification.client_email)
+    client = _lookup_client(classification.client_email, client_prefetch)
     if client:
         result["client_found"] = True
         result["client_data"] = client
@@ -814,6 +856,41 @@ def _update_inbound_state(
 # SECTION 3: Persistence — all DB writes after processing
 # ═══════════════════════════════════════════════════════════════════════════
 
+def _email_rows(
+    classification,
+    result: dict,
+    gmail_thread_id: str | None,
+    gmail_message_id: str | None,
+    email_text: str,
+    hold_mode: bool = False,
+    hold_reason: str | None = None,
+) -> list[dict]:
+    """EmailHistory rows for this email: inbound, plus the outbound reply if any."""
+    subject = _extract_subject(email_text)
+    email_rows = [{
+        "client_email": classification.client_email,
+        "direction": "inbound",
+        "subject": subject,
+        "body": email_text,
+        "situation": classification.situation,
+        "gmail_message_id": gmail_message_id,
+        "gmail_thread_id": gmail_thread_id,
+        "deferred": hold_mode,
+        "deferred_reason": hold_reason,
+    }]
+    has_reply = not hold_mode and result["needs_reply"] and result.get("draft_reply")
+    if has_reply:
+        email_rows.append({
+            "client_email": classification.client_email,
+            "direction": "outbound",
+            "subject": f"Re: {subject}" if subject else "",
+            "body": result["draft_reply"],
+            "situation": classification.situation,
+            "gmail_thread_id": gmail_thread_id,
+        })
+    return email_rows
+
+
 def _persist_results(
     classification,
     result: dict,
@@ -825,40 +902,17 @@ def _persist_results(
     hold_reason: str | None = None,
 ) -> None:
     """Persist emails, order items, address and conversation state to the DB."""
-    # Step 5: Extract subject from email text
-    subject = ""
-    for line in email_text.split("\n"):
-        if line.lower().startswith("subject:"):
-            subject = line.split(":", 1)[1].strip()
-            break
-
     # Step 5: Save inbound email (ALWAYS — with deferred flag for hold)
-    save_email(
-        client_email=classification.client_email,
-        direction="inbound",
-        subject=subject,
-        body=email_text,
-        situation=classification.situation,
-        gmail_message_id=gmail_message_id,
-        gmail_thread_id=gmail_thread_id,
-        deferred=hold_mode,
-        deferred_reason=hold_reason,
-    )
+    # and the outbound reply, in one transaction
+    save_emails_bulk(_email_rows(
+        classification, result, gmail_thread_id, gmail_message_id, email_text,
+        hold_mode=hold_mode, hold_reason=hold_reason,
+    ))
 
     if hold_mode:
         return  # Skip: outbound, state transitions, order items, address, fulfillment, summary
 
     if result["needs_reply"] and result.get("draft_reply"):
-        # Save outbound reply
-        save_email(
-            client_email=classification.client_email,
-            direction="outbound",
-            subject=f"Re: {subject}" if subject else "",
-            body=result["draft_reply"],
-            situation=classification.situation,
-            gmail_thread_id=gmail_thread_id,
-        )
-
         # Update state with outbound draft (Python, no LLM needed)
         if gmail_thread_id and result.get("conversation_state"):
             try:
@@ -1143,12 +1197,156 @@ def _persist_results(
 # SECTION 4: Main orchestrator
 # ═══════════════════════════════════════════════════════════════════════════
 
+_DRAFT_SKIP_PREFIXES = ("(", "—")  # system messages, not real replies
+
+
+def _create_gmail_draft(
+    classification,
+    result: dict,
+    email_text: str,
+    gmail_thread_id: str,
+    gmail_account: str,
+) -> str | None:
+    """Create the Gmail reply draft. Returns draft ID, or None on failure."""
+    try:
+        from tools.gmail import GmailClient
+
+        subject = _extract_subject(email_text)
+        reply_subject = f"Re: {subject}" if subject else ""
+
+        draft_reply = result.get("draft_reply") or ""
+        draft_html = result.get("draft_reply_html")
+        return GmailClient(account=gmail_account).create_draft(
+            to=classification.client_email,
+            subject=reply_subject,
+            body=draft_html or draft_reply,
+            thread_id=gmail_thread_id,
+            html=bool(draft_html),
+        )
+    except Exception as e:
+        logger.error("Failed to create Gmail draft: %s", e, exc_info=True)
+        return None
+
+
+def _start_gmail_draft(
+    classification,
+    result: dict,
+    email_text: str,
+    gmail_thread_id: str | None,
+    gmail_account: str,
+) -> Future | None:
+    """Submit Gmail draft creation to the I/O pool if the reply warrants one.
+
+    Returns the pending Future, or None when no draft should be created
+    (no reply needed, system placeholder reply, or no Gmail thread).
+    """
+    draft_reply = result.get("draft_reply") or ""
+    if not (
+        result["needs_reply"]
+        and draft_reply
+        and not draft_reply.startswith(_DRAFT_SKIP_PREFIXES)
+        and gmail_thread_id
+    ):
+        return None
+    return _IO_POOL.submit(
+        _create_gmail_draft,
+        classification, result, email_text, gmail_thread_id, gmail_account,
+    )
+
+
+def _save_rows_after_draft(
+    classification,
+    result: dict,
+    draft_future: Future,
+    gmail_thread_id: str | None,
+    gmail_message_id: str | None,
+    email_text: str,
+) -> None:
+    """Record an email whose processing failed after its Gmail draft was started.
+
+    Without the inbound row the message counts as unprocessed, and the
+    poller's reconcile pass would run it again and create a second draft.
+    No draft (creation failed) means reprocessing is safe — nothing is saved.
+    """
+    if not draft_future.result():
+        return
+    try:
+        save_emails_bulk(_email_rows(
+            classification, result, gmail_thread_id, gmail_message_id, email_text,
+        ))
+    except Exception as e:
+        logger.error("Failed to save email after draft creation: %s", e, exc_info=True)
+
+
+def _is_ignored_email(classification, result: dict, pre_state_record: dict | None) -> bool:
+    """No-reply "other" email from an unknown sender on a thread we don't track.
+
+    Such emails (marketing, bounces, stray "thanks") get no draft, no
+    notification and no state — skip the state updater and side-effect steps.
+    """
+    return (
+        not result["needs_reply"]
+        and classification.situation == "other"
+        and not result["client_found"]
+        and not pre_state_record
+    )
+
+
+def _has_empty_body(email_text: str) -> bool:
+    """True for emails with no text after the Body: marker (e.g. inline image only)."""
+    _body_marker = "Body:"
+    _body_idx = email_text.find(_body_marker)
+    _body_content = email_text[_body_idx + len(_body_marker):].strip() if _body_idx >= 0 else email_text.strip()
+    return not _body_content
+
+
+def _start_history_prefetch(classification, result: dict) -> tuple[tuple, Future] | None:
+    """Load handler history in the background for emails routed to an LLM handler.
+
+    Only handle_general() and handle_oos_followup() read history (via
+    build_context()); the load overlaps the state update and notifications
+    that run before routing. Templated situations never start it — their
+    rare fallbacks to handle_general() load history synchronously.
+    """
+    if not (result.get("needs_routing") and result.get("needs_reply")):
+        return None
+    situation = result.get("situation", classification.situation)
+    if SITUATION_HANDLERS.get(situation, handle_general) not in _HISTORY_HANDLERS:
+        return None
+    gmail_thread_id = result.get("gmail_thread_id")
+    client_email = result.get("client_email", "")
+    if not gmail_thread_id and not client_email:
+        return None
+    try:
+        future = _IO_POOL.submit(load_history, gmail_thread_id, client_email)
+    except RuntimeError:  # pool shut down (interpreter exit)
+        return None
+    return history_key(gmail_thread_id, client_email), future
+
+
+def _start_client_prefetch(email_text: str) -> tuple[str, Future] | None:
+    """Speculatively look up the sender's client record while the classifier runs.
+
+    The header-parsed sender always overrides the LLM's client_email, so
+    the lookup almost always matches.
+    """
+    sender = _extract_sender_email(email_text)
+    if not sender:
+        return None
+    try:
+        future = _IO_POOL.submit(get_client, sender)
+    except RuntimeError:  # pool shut down (interpreter exit)
+        return None
+    return sender.lower().strip(), future
+
+
 def classify_and_process(
     email_text: str,
     gmail_message_id: str | None = None,
     gmail_thread_id: str | None = None,
     gmail_account: str = "default",
     auto_mode: bool = False,
+    bypass_cache: bool = False,
 ) -> str:
     """Classify an incoming email and generate a reply draft.
 
@@ -1159,25 +1357,58 @@ def classify_and_process(
         email_text: The full email text including From, Subject, Body etc.
         gmail_message_id: Optional Gmail message ID for deduplication.
         gmail_thread_id: Optional Gmail thread ID for thread tracking.
+        bypass_cache: Ask the classifier LLM again even if this exact input
+            was classified recently (manual reprocess).
 
     Returns:
         Formatted classification result with draft reply if template exists.
     """
+    return _classify_and_process(
+        email_text, gmail_message_id, gmail_thread_id, gmail_account, auto_mode,
+        bypass_cache=bypass_cache,
+    )
+
+
+def _classify_and_process(
+    email_text: str,
+    gmail_message_id: str | None,
+    gmail_thread_id: str | None,
+    gmail_account: str,
+    auto_mode: bool,
+    preclassified: tuple | None = None,
+    bypass_cache: bool = False,
+) -> str:
+    """Body of classify_and_process().
+
+    preclassified: (context_str, pre_state_record, last_order, classification)
+        from classify_and_process_batch() — skips Steps 0.5–1.
+    """
+    # Set once a Gmail draft is underway, cleared once _persist_results() runs
+    draft_future = None
     try:
         # Step 0: Skip emails with empty body (e.g. inline image only, no text)
-        _body_marker = "Body:"
-        _body_idx = email_text.find(_body_marker)
-        _body_content = email_text[_body_idx + len(_body_marker):].strip() if _body_idx >= 0 else email_text.strip()
-        if not _body_content:
+        if _has_empty_body(email_text):
             logger.info("Skipping email with empty body (gmail_message_id=%s)", gmail_message_id)
             return "Пропущено: письмо без текста (возможно, только изображение/вложение)."
 
-        # Step 0.5: Get conversation state + thread history for classifier context
-        context_str, pre_state_record, last_order = build_classifier_context(gmail_thread_id, email_text, gmail_account=gmail_account)
+        # Overlaps the client lookup with classification
+        client_prefetch = _start_client_prefetch(email_text)
+
+        if preclassified is not None:
+            context_str, pre_state_record, last_order, classification = preclassified
+            state_dict = pre_state_record.get("state") if pre_state_record else None
+        else:
+            # Step 0.5: Get conversation state + thread history for classifier context
+            context_str, pre_state_record, last_order = build_classifier_context(
+                gmail_thread_id, email_text, gmail_account=gmail_account,
+            )
 
-        # Step 0.9 + 1: Deterministic parser or LLM classification
-        state_dict = pre_state_record.get("state") if pre_state_record else None
-        classification = run_classification(email_text, context_str, conversation_state=state_dict, last_order=last_order)
+            # Step 0.9 + 1: Deterministic parser or LLM classification
+            state_dict = pre_state_record.get("state") if pre_state_record else None
+            classification = run_classification(
+                email_text, context_str, conversation_state=state_dict, last_order=last_order,
+                bypass_cache=bypass_cache,
+            )
 
         # Fix 2B: Fallback override other->payment_received for legacy threads
         # without facts.payment_request_sent. Uses "use email below" as prepay-only
@@ -1261,6 +1492,7 @@ def classify_and_process(
                         email_text, context_str,
                         conversation_state=state_dict,
                         last_order=last_order,
+                        bypass_cache=bypass_cache,
                     )
                     logger.info(
                         "Re-classified after stale reset: "
@@ -1298,6 +1530,7 @@ def classify_and_process(
             gmail_message_id=gmail_message_id,
             gmail_thread_id=gmail_thread_id,
             gmail_account=gmail_account,
+            client_prefetch=client_prefetch,
         )
 
         # Attach gmail_thread_id and gmail_account for downstream context building
@@ -1323,6 +1556,23 @@ def classify_and_process(
             )
             return formatted
 
+        # Step 2.95: Ignored email — nothing downstream acts on it
+        if _is_ignored_email(classification, result, pre_state_record):
+            logger.info(
+                "Ignored email (no reply, unknown sender, new thread): %s",
+                classification.client_email,
+            )
+            formatted = format_result(result)
+            # Still persisted: the inbound row is the dedup record for the poller
+            _persist_results(
+                classification, result, gmail_thread_id, gmail_message_id,
+                email_text, gmail_account=gmail_account,
+            )
+            return formatted
+
+        # Consumed by build_context() in the LLM handlers
+        result["history_prefetch"] = _start_history_prefetch(classification, result)
+
         # Step 2.5: State Updater — update ConversationState
         result["conversation_state"] = _update_inbound_state(
             gmail_thread_id, email_text, classification, pre_state_record,
@@ -1349,6 +1599,13 @@ def classify_and_process(
             result = route_to_handler(classification, result, email_text)
             result["needs_routing"] = False
 
+            # The reply text is final after routing: start the Gmail draft
+            # now so its round-trip overlaps the checker LLM call and the
+            # Telegram notifications below.
+            draft_future = _start_gmail_draft(
+                classification, result, email_text, gmail_thread_id, gmail_account,
+            )
+
             # Phase 2 state enrichment (only for deterministic state path)
             if (
                 state_updater._use_llm() != "true"
@@ -1394,35 +1651,14 @@ def classify_and_process(
             notify_reply_ready(classification, result)
 
         # Step 3.9: Create Gmail draft in the same thread
-        draft_reply = result.get("draft_reply") or ""
-        _SKIP_PREFIXES = ("(", "—")  # system messages, not real replies
-        if (
-            result["needs_reply"]
-            and draft_reply
-            and not draft_reply.startswith(_SKIP_PREFIXES)
-            and gmail_thread_id
-        ):
-            try:
-                from tools.gmail import GmailClient
-
-                subject = ""
-                for line in email_text.split("\n"):
-                    if line.lower().startswith("subject:"):
-                        subject = line.split(":", 1)[1].strip()
-                        break
-                reply_subject = f"Re: {subject}" if subject else ""
-
-                draft_html = result.get("draft_reply_html")
-                draft_id = GmailClient(account=gmail_account).create_draft(
-                    to=classification.client_email,
-                    subject=reply_subject,
-                    body=draft_html or draft_reply,
-                    thread_id=gmail_thread_id,
-                    html=bool(draft_html),
-                )
-                result["gmail_draft_id"] = draft_id
-            except Exception as e:
-                logger.error("Failed to create Gmail draft: %s", e, exc_info=True)
+        # (routed replies started it already — collect the result here)
+        if draft_future is None:
+            draft_future = _start_gmail_draft(
+                classification, result, email_text, gmail_thread_id, gmail_account,
+            )
+        draft_id = draft_future.result() if draft_future else None
+        if draft_id:
+            result["gmail_draft_id"] = draft_id
 
         # Step 3.95: Fulfillment — maks_sales increment (after successful draft)
         if result.get("gmail_draft_id"):
@@ -1461,12 +1697,17 @@ def classify_and_process(
         formatted = format_result(result)
 
         # Step 5-7: Persist everything
+        draft_future = None
         _persist_results(classification, result, gmail_thread_id, gmail_message_id, email_text, gmail_account=gmail_account)
 
         return formatted
 
     except Exception as e:
         logger.error("Email processing failed: %s", e, exc_info=True)
+        if draft_future is not None:
+            _save_rows_after_draft(
+                classification, result, draft_future, gmail_thread_id, gmail_message_id, email_text,
+            )
         send_telegram(
             f"\U0001f6a8 <b>Ошибка обработки email!</b>\n\n"
             f"Ошибка: {e}\n"
@@ -1474,3 +1715,81 @@ def classify_and_process(
             f"Проверь логи контейнера."
         )
         return f"ERROR: Email processing failed — {e}"
+
+
+def classify_and_process_batch(
+    emails: list[dict],
+    gmail_account: str = "default",
+    auto_mode: bool = False,
+) -> list[str]:
+    """Classify and process several incoming emails, sharing classifier LLM calls.
+
+    Emails are classified together (up to BATCH_CLASSIFY_MAX per LLM call),
+    then processed one by one in the given order, exactly like
+    classify_and_process(). Only the first email per thread and per sender
+    is batch-classified: a later email from the same conversation must see
+    the state written by the earlier one, so it is classified on its own
+    when its turn comes.
+
+    Args:
+        emails: List of dicts with keys email_text, gmail_message_id,
+            gmail_thread_id (ids optional).
+        gmail_account: Gmail account the emails were fetched from.
+        auto_mode: Same as classify_and_process().
+
+    Returns:
+        One formatted result per email, in the same order.
+    """
+    preclassified: dict[int, tuple] = {}
+    batch_indexes: list[int] = []
+    batch_contexts: list[tuple] = []
+    seen_threads: set[str] = set()
+    seen_senders: set[str] = set()
+
+    for i, email in enumerate(emails):
+        email_text = email.get("email_text") or ""
+        thread_id = email.get("gmail_thread_id")
+        sender = _extract_sender_email(email_text)
+        if (
+            _has_empty_body(email_text)
+            or (thread_id and thread_id in seen_threads)
+            or (sender and sender in seen_senders)
+        ):
+            continue
+        if thread_id:
+            seen_threads.add(thread_id)
+        if sender:
+            seen_senders.add(sender)
+        try:
+            batch_contexts.append(
+                build_classifier_context(thread_id, email_text, gmail_account=gmail_account)
+            )
+            batch_indexes.append(i)
+        except Exception as e:
+            # classify_and_process() below retries and reports the error
+            logger.warning("Batch context failed for %s: %s", email.get("gmail_message_id"), e)
+
+    if batch_indexes:
+        requests = []
+        for i, (context_str, pre_state_record, last_order) in zip(batch_indexes, batch_contexts):
+            state_dict = pre_state_record.get("state") if pre_state_record else None
+            requests.append((emails[i].get("email_text") or "", context_str, state_dict, last_order))
+        try:
+            classifications = run_classification_batch(requests)
+        except Exception as e:
+            logger.warning("Batch classification failed, classifying one by one: %s", e)
+        else:
+            for i, context, classification in zip(batch_indexes, batch_contexts, classifications):
+                preclassified[i] = (*context, classification)
+
+    return [
+        _classify_and_process(
+            email.get("email_text") or "",
+            email.get("gmail_message_id"),
+            email.get("gmail_thread_id"),
+            gmail_account,
+            auto_mode,
+            preclassified=preclassified.get(i),
+        )
+        for i, email in enumerate(emails)
+    ]
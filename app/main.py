@@ -8,6 +8,7 @@ Run:
     python -m app.main
 """
 
+import asyncio
 import logging
 import threading
 import time
@@ -53,18 +54,30 @@ app = agent_os.get_app()
 
 # ---------------------------------------------------------------------------
 # Gmail Poller — background task + manual trigger endpoint
+#
+# Endpoints below are async but the work they trigger (Gmail/Sheets HTTP,
+# SQLAlchemy, LLM calls) is blocking — it runs via asyncio.to_thread so the
+# event loop keeps serving AgentOS requests meanwhile.
 # ---------------------------------------------------------------------------
-GMAIL_POLL_INTERVAL = 60  # seconds
+# Gmail push (optional): with GMAIL_PUSH_TOPIC + GMAIL_PUSH_TOKEN set, Gmail
+# announces inbox changes via Pub/Sub → /api/gmail/push and the timed poll
+# only runs as a slow fallback (missed deliveries, lapsed watch).
+_AUTO_POLL = bool(getenv("GMAIL_REFRESH_TOKEN", "")) and getenv("AUTO_POLL", "").lower() == "true"
+_GMAIL_PUSH_TOKEN = getenv("GMAIL_PUSH_TOKEN", "").strip()
+_GMAIL_PUSH = _AUTO_POLL and bool(_GMAIL_PUSH_TOKEN and getenv("GMAIL_PUSH_TOPIC", ""))
+GMAIL_POLL_INTERVAL = 600 if _GMAIL_PUSH else 60  # seconds
 STOCK_SYNC_INTERVAL = int(getenv("STOCK_SYNC_INTERVAL", "300"))  # seconds (5 min default)
 
 
 def _gmail_poll_thread():
     """Background thread: poll Gmail every GMAIL_POLL_INTERVAL seconds."""
-    from tools.gmail_poller import poll_gmail
+    from tools.gmail_poller import poll_gmail, renew_gmail_watches
 
     logger.info("Gmail poller thread started (interval=%ds)", GMAIL_POLL_INTERVAL)
     while True:
         try:
+            if _GMAIL_PUSH:
+                renew_gmail_watches()
             count = poll_gmail()
             if count:
                 logger.info("Gmail poll: %d messages processed", count)
@@ -75,7 +88,7 @@ def _gmail_poll_thread():
 
 # Start Gmail poller as daemon thread (dies with main process)
 # AUTO_POLL=true enables automatic polling; default is off (manual mode via process_email)
-if getenv("GMAIL_REFRESH_TOKEN", "") and getenv("AUTO_POLL", "").lower() == "true":
+if _AUTO_POLL:
     threading.Thread(target=_gmail_poll_thread, daemon=True).start()
     logger.info("Gmail poller thread launched (every %ds)", GMAIL_POLL_INTERVAL)
 elif getenv("GMAIL_REFRESH_TOKEN", ""):
@@ -89,10 +102,34 @@ async def trigger_gmail_poll():
     """Manual trigger for Gmail polling."""
     from tools.gmail_poller import poll_gmail
 
-    count = poll_gmail()
+    count = await asyncio.to_thread(poll_gmail)
     return {"processed": count}
 
 
+if _GMAIL_PUSH:
+    import hmac
+
+    from fastapi import BackgroundTasks, HTTPException
+
+    @app.post("/api/gmail/push")
+    async def gmail_push(body: dict, background_tasks: BackgroundTasks, token: str = ""):
+        """Pub/Sub push endpoint for Gmail watch notifications.
+
+        The subscription's push URL carries ?token=GMAIL_PUSH_TOKEN.
+        """
+        # Bytes: compare_digest raises TypeError on non-ASCII str
+        if not hmac.compare_digest(token.encode(), _GMAIL_PUSH_TOKEN.encode()):
+            raise HTTPException(status_code=403, detail="invalid token")
+        from tools.gmail_poller import handle_push_notification
+
+        # Ack right away — a poll cycle can outlast the Pub/Sub ack deadline,
+        # and an unacked delivery would be redelivered
+        background_tasks.add_task(handle_push_notification, body)
+        return {"status": "ok"}
+
+    logger.info("Gmail push endpoint registered (fallback poll every %ds)", GMAIL_POLL_INTERVAL)
+
+
 @app.post("/api/process-email")
 async def trigger_process_email(body: dict):
     """Process the latest unread email from a specific client.
@@ -106,7 +143,7 @@ async def trigger_process_email(body: dict):
         return {"error": "email is required"}
 
     account = body.get("account", "default")
-    result = process_client_email(email, account=account)
+    result = await asyncio.to_thread(process_client_email, email, account=account)
     return {"result": result}
 
 
@@ -154,7 +191,7 @@ async def trigger_stock_sync():
     """Manual trigger for stock synchronization."""
     from tools.stock_sync import sync_stock_from_sheets
 
-    result = sync_stock_from_sheets()
+    result = await asyncio.to_thread(sync_stock_from_sheets)
     return result
 
 
@@ -164,11 +201,13 @@ async def trigger_stock_reanalyze():
     from db.sheet_config import delete_sheet_config
     from tools.stock_sync import _load_warehouse_configs, sync_stock_from_sheets
 
-    configs = _load_warehouse_configs()
-    for cfg in configs:
-        delete_sheet_config(cfg.name)
+    def _reanalyze():
+        configs = _load_warehouse_configs()
+        for cfg in configs:
+            delete_sheet_config(cfg.name)
+        return configs, sync_stock_from_sheets()
 
-    result = sync_stock_from_sheets()
+    configs, result = await asyncio.to_thread(_reanalyze)
     return {"reanalyzed": len(configs), "sync_result": result}
 
 
@@ -191,7 +230,7 @@ if _SHIPPING_TOKEN:
         _check_shipping_token(x_shipping_token)
         from db.shipping import claim_next_shipping_job
 
-        job = claim_next_shipping_job()
+        job = await asyncio.to_thread(claim_next_shipping_job)
         if not job:
             return {"status": "empty"}
         return {"status": "ok", "job": job}
@@ -207,7 +246,7 @@ if _SHIPPING_TOKEN:
         from db.shipping import complete_shipping_job
 
         claim_token = body.get("claim_token", "")
-        ok = complete_shipping_job(job_id, claim_token)
+        ok = await asyncio.to_thread(complete_shipping_job, job_id, claim_token)
         if ok:
             return {"status": "ok"}
         return {"status": "invalid_token_or_state"}
@@ -226,7 +265,10 @@ if _SHIPPING_TOKEN:
         error = body.get("error", "unknown")
         permanent = body.get("permanent", False)
         reset_retry = body.get("reset_retry", False)
-        ok = fail_shipping_job(job_id, claim_token, error, permanent=permanent, reset_retry=reset_retry)
+        ok = await asyncio.to_thread(
+            fail_shipping_job, job_id, claim_token, error,
+            permanent=permanent, reset_retry=reset_retry,
+        )
         if ok:
             return {"status": "ok"}
         return {"status": "invalid_token_or_state"}
@@ -240,4 +282,6 @@ if __name__ == "__main__":
     agent_os.serve(
         app="main:app",
         reload=getenv("RUNTIME_ENV", "prd") == "dev",
+        loop="uvloop",
+        http="httptools",
     )
@@ -7,28 +7,78 @@ Includes aggregated client profile for LLM context.
 """
 
 import logging
+import threading
 from datetime import datetime
 
-from sqlalchemy import func
+from cachetools import TTLCache
+from sqlalchemy import case, func, select, update
+from sqlalchemy.orm import load_only
 
 from db.models import Client, ClientOrderItem, EmailHistory, get_session
 
 logger = logging.getLogger(__name__)
 
+# Read cache for get_client()/list_clients(). Every mutator below clears the
+# affected entries after commit; the TTL bounds staleness for rows changed
+# outside this process (psql, scripts). Entries are copied on the way in and
+# out — callers mutate client dicts.
+_CLIENT_CACHE_TTL = 60
+_ALL_CLIENTS_KEY = ("__all__",)
+_client_cache: TTLCache = TTLCache(maxsize=1024, ttl=_CLIENT_CACHE_TTL)
+_client_cache_lock = threading.RLock()
+
+_VALID_PAYMENT_TYPES = frozenset(("prepay", "postpay"))
+# Fields update_client() may change (notes/summary have their own setters)
+_CLIENT_UPDATABLE = frozenset((
+    "name", "payment_type", "zelle_address", "street", "city_state_zip",
+    "discount_percent", "discount_orders_left",
+))
+
+# Columns Client.to_dict() reads — skips id/created_at on read paths. Must
+# stay in sync with to_dict(), or each missing column costs a lazy load.
+_CLIENT_DICT_COLUMNS = load_only(
+    Client.email, Client.name, Client.payment_type, Client.zelle_address,
+    Client.street, Client.city_state_zip, Client.discount_percent,
+    Client.discount_orders_left, Client.notes, Client.llm_summary,
+    Client.summary_updated_at,
+)
+
+
+def _invalidate_client(email: str) -> None:
+    """Drop the cached row for email and the cached client list."""
+    with _client_cache_lock:
+        _client_cache.pop(email, None)
+        _client_cache.pop(_ALL_CLIENTS_KEY, None)
+
+
+def _reset_client_cache() -> None:
+    """Clear the client cache (tests)."""
+    with _client_cache_lock:
+        _client_cache.clear()
+
 
 def get_client(email: str) -> dict | None:
     """Look up a client by email.
 
     Returns dict with client data or None if not found.
     """
+    key = email.lower().strip()
+    with _client_cache_lock:
+        cached = _client_cache.get(key)
+    if cached is not None:
+        return dict(cached)
+
     session = get_session()
     try:
-        client = session.query(Client).filter_by(
-            email=email.lower().strip()
-        ).first()
+        client = session.execute(
+            select(Client).options(_CLIENT_DICT_COLUMNS).filter_by(email=key)
+        ).scalar_one_or_none()
         if client:
             logger.info("Client found: %s (%s)", email, client.payment_type)
-            return client.to_dict()
+            data = client.to_dict()
+            with _client_cache_lock:
+                _client_cache[key] = dict(data)
+            return data
         logger.warning("Client not found: %s", email)
         return None
     finally:
@@ -37,12 +87,21 @@ def get_client(email: str) -> dict | None:
 
 def list_clients() -> list[dict]:
     """List all clients ordered by name."""
+    with _client_cache_lock:
+        cached = _client_cache.get(_ALL_CLIENTS_KEY)
+    if cached is not None:
+        return [dict(c) for c in cached]
+
     session = get_session()
     try:
-        clients = session.query(Client).order_by(Client.name).all()
-        return [c.to_dict() for c in clients]
+        clients = [c.to_dict() for c in session.scalars(
+            select(Client).options(_CLIENT_DICT_COLUMNS).order_by(Client.name)
+        )]
     finally:
         session.close()
+    with _client_cache_lock:
+        _client_cache[_ALL_CLIENTS_KEY] = [dict(c) for c in clients]
+    return clients
 
 
 def add_client(
@@ -59,7 +118,7 @@ def add_client(
 
     Raises ValueError if client already exists or payment_type is invalid.
     """
-    if payment_type not in ("prepay", "postpay"):
+    if payment_type not in _VALID_PAYMENT_TYPES:
         raise ValueError(f"payment_type must be 'prepay' or 'postpay', got '{payment_type}'")
     if not 0 <= discount_percent <= 100:
         raise ValueError(f"discount_percent must be 0-100, got {discount_percent}")
@@ -83,6 +142,7 @@ def add_client(
         )
         session.add(client)
         session.commit()
+        _invalidate_client(email)
         logger.info("Added client: %s (%s, %s)", email, name, payment_type)
         return client.to_dict()
     finally:
@@ -96,10 +156,9 @@ def update_client(email: str, **fields) -> dict | None:
     discount_percent, discount_orders_left.
     """
     email = email.lower().strip()
-    allowed = {"name", "payment_type", "zelle_address", "street", "city_state_zip", "discount_percent", "discount_orders_left"}
-    fields = {k: v for k, v in fields.items() if k in allowed and v is not None}
+    fields = {k: v for k, v in fields.items() if v is not None and k in _CLIENT_UPDATABLE}
 
-    if "payment_type" in fields and fields["payment_type"] not in ("prepay", "postpay"):
+    if "payment_type" in fields and fields["payment_type"] not in _VALID_PAYMENT_TYPES:
         raise ValueError(f"payment_type must be 'prepay' or 'postpay'")
 
     session = get_session()
@@ -111,6 +170,7 @@ def update_client(email: str, **fields) -> dict | None:
         for key, value in fields.items():
             setattr(client, key, value)
         session.commit()
+        _invalidate_client(email)
         logger.info("Updated client %s: %s", email, fields)
         return client.to_dict()
     finally:
@@ -127,24 +187,37 @@ def delete_client(email: str) -> bool:
             return False
         session.delete(client)
         session.commit()
+        _invalidate_client(email)
         logger.info("Deleted client: %s", email)
         return True
     finally:
         session.close()
 
 
-def decrement_discount(email: str) -> None:
-    """Decrement discount_orders_left by 1. Resets discount_percent when 0."""
+def decrement_discount(email: str) -> bool:
+    """Decrement discount_orders_left by 1. Resets discount_percent when 0.
+
+    Single atomic UPDATE, so concurrent workers can't both spend the last
+    discounted order. Returns True if a discounted order was used up.
+    """
+    email = email.lower().strip()
     session = get_session()
     try:
-        client = session.query(Client).filter_by(
-            email=email.lower().strip()
-        ).first()
-        if client and client.discount_orders_left and client.discount_orders_left > 0:
-            client.discount_orders_left -= 1
-            if client.discount_orders_left == 0:
-                client.discount_percent = 0
-            session.commit()
+        updated = session.execute(
+            update(Client)
+            .where(Client.email == email, Client.discount_orders_left > 0)
+            .values(
+                discount_orders_left=Client.discount_orders_left - 1,
+                discount_percent=case(
+                    (Client.discount_orders_left <= 1, 0),
+                    else_=Client.discount_percent,
+                ),
+            )
+        ).rowcount
+        session.commit()
+        if updated:
+            _invalidate_client(email)
+        return bool(updated)
     finally:
         session.close()
 
@@ -234,6 +307,7 @@ def update_client_notes(email: str, notes: str) -> bool:
             return False
         client.notes = notes
         session.commit()
+        _invalidate_client(email)
         logger.info("Updated notes for %s", email)
         return True
     finally:
@@ -254,6 +328,7 @@ def update_client_summary(email: str, summary: str) -> bool:
         client.llm_summary = summary
         client.summary_updated_at = datetime.utcnow()
         session.commit()
+        _invalidate_client(email)
         logger.info("Updated LLM summary for %s", email)
         return True
     finally:
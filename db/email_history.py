@@ -8,6 +8,8 @@ Save/read email history, Gmail state management, Gmail thread search.
 import logging
 from datetime import timezone
 
+from sqlalchemy import case, func, select
+
 from db.models import EmailHistory, GmailState, get_session
 
 logger = logging.getLogger(__name__)
@@ -42,42 +44,84 @@ def save_email(
     metadata (situation, deferred). Preserves body, subject, created_at
     for audit trail integrity.
     """
+    save_emails_bulk([{
+        "client_email": client_email,
+        "direction": direction,
+        "subject": subject,
+        "body": body,
+        "situation": situation,
+        "gmail_message_id": gmail_message_id,
+        "gmail_thread_id": gmail_thread_id,
+        "deferred": deferred,
+        "deferred_reason": deferred_reason,
+    }])
+
+
+def save_emails_bulk(records: list[dict]) -> None:
+    """Save several emails in one transaction.
+
+    Each record holds save_email() keyword arguments (gmail_message_id,
+    gmail_thread_id, deferred, deferred_reason optional) and gets the same
+    UPSERT semantics. Existing gmail_message_ids are looked up with one
+    query; all rows are committed together.
+    """
+    if not records:
+        return
+
     session = get_session()
     try:
-        # UPSERT: if gmail_message_id exists, update only processing metadata
-        if gmail_message_id:
-            existing = (
-                session.query(EmailHistory)
-                .filter_by(gmail_message_id=gmail_message_id)
-                .first()
-            )
-            if existing:
-                existing.situation = situation
-                existing.deferred = deferred
-                existing.deferred_reason = deferred_reason
+        message_ids = [r["gmail_message_id"] for r in records if r.get("gmail_message_id")]
+        existing: dict[str, EmailHistory] = {}
+        if message_ids:
+            existing = {
+                row.gmail_message_id: row
+                for row in session.query(EmailHistory)
+                .filter(EmailHistory.gmail_message_id.in_(message_ids))
+                .all()
+            }
+
+        new_rows = []
+        for r in records:
+            gmail_message_id = r.get("gmail_message_id")
+            deferred = r.get("deferred", False)
+            deferred_reason = r.get("deferred_reason")
+
+            # UPSERT: if gmail_message_id exists, update only processing metadata
+            row = existing.get(gmail_message_id) if gmail_message_id else None
+            if row is not None:
+                row.situation = r["situation"]
+                row.deferred = deferred
+                row.deferred_reason = deferred_reason
                 # body, subject, created_at, direction — preserved
-                session.commit()
                 logger.info(
                     "Updated email %s: situation=%s, deferred=%s",
-                    gmail_message_id[:12], situation, deferred,
+                    gmail_message_id[:12], r["situation"], deferred,
                 )
-                return
-
-        # Normal INSERT
-        record = EmailHistory(
-            client_email=client_email.lower().strip(),
-            direction=direction,
-            subject=subject,
-            body=body,
-            situation=situation,
-            gmail_message_id=gmail_message_id,
-            gmail_thread_id=gmail_thread_id,
-            deferred=deferred,
-            deferred_reason=deferred_reason,
-        )
-        session.add(record)
+                continue
+
+            # Normal INSERT
+            row = EmailHistory(
+                client_email=r["client_email"].lower().strip(),
+                direction=r["direction"],
+                subject=r["subject"],
+                body=r["body"],
+                situation=r["situation"],
+                gmail_message_id=gmail_message_id,
+                gmail_thread_id=r.get("gmail_thread_id"),
+                deferred=deferred,
+                deferred_reason=deferred_reason,
+            )
+            new_rows.append(row)
+            if gmail_message_id:
+                existing[gmail_message_id] = row  # duplicate id later in the batch → update
+
+        session.add_all(new_rows)
         session.commit()
-        logger.info("Saved %s email for %s (situation=%s, thread=%s, deferred=%s)", direction, client_email, situation, gmail_thread_id, deferred)
+        for row in new_rows:
+            logger.info(
+                "Saved %s email for %s (situation=%s, thread=%s, deferred=%s)",
+                row.direction, row.client_email, row.situation, row.gmail_thread_id, row.deferred,
+            )
     except Exception as e:
         logger.error("Failed to save email history: %s", e)
         session.rollback()
@@ -116,39 +160,34 @@ def get_email_history(client_email: str, max_total: int = 10) -> list[dict]:
 
     Always includes the last 3 messages. Fills remaining slots with
     high-priority earlier messages (orders, prices, stock discussions).
+    Candidates are the 50 newest messages; selection happens in the DB.
     """
+    newest_first = (EmailHistory.created_at.desc(), EmailHistory.id.desc())
     session = get_session()
     try:
+        window = (
+            select(
+                EmailHistory.id,
+                func.row_number().over(order_by=newest_first).label("rn"),
+                case(_PRIORITY_SCORES, value=EmailHistory.situation, else_=1).label("score"),
+            )
+            .where(EmailHistory.client_email == client_email.lower().strip())
+            .order_by(*newest_first)
+            .limit(50)
+            .subquery()
+        )
         rows = (
             session.query(EmailHistory)
-            .filter_by(client_email=client_email.lower().strip())
-            .order_by(EmailHistory.created_at.desc())
-            .limit(50)
+            .join(window, EmailHistory.id == window.c.id)
+            # 3 most recent first, then earlier ones by priority, newer first
+            .order_by(case((window.c.rn <= 3, 0), else_=1), window.c.score.desc(), window.c.rn)
+            .limit(max_total)
             .all()
         )
-        if not rows:
-            return []
-
-        # Always include the 3 most recent messages
-        recent = rows[:3]
-        earlier = rows[3:]
-
-        # Score earlier messages by priority
-        scored = []
-        for row in earlier:
-            score = _PRIORITY_SCORES.get(row.situation, 1)
-            scored.append((score, row))
-        scored.sort(key=lambda x: x[0], reverse=True)
 
-        # Fill remaining slots with highest-priority earlier messages
-        remaining_slots = max_total - len(recent)
-        selected_earlier = [row for _, row in scored[:remaining_slots]]
-
-        # Combine and sort chronologically (oldest first)
-        combined = list(recent) + selected_earlier
-        combined.sort(key=lambda r: r.created_at)
-
-        return [r.to_dict() for r in combined]
+        # Chronological order (oldest first)
+        rows.sort(key=lambda r: r.created_at)
+        return [r.to_dict() for r in rows]
     finally:
         session.close()
 
@@ -159,13 +198,27 @@ def get_email_history(client_email: str, max_total: int = 10) -> list[dict]:
 
 _ACCOUNT_STATE_IDS = {"default": 1, "tilda": 2}
 
+# The poller is the only writer of gmail_state, so after the first read the
+# process already knows the value: state_id → last_history_id.
+_gmail_state_cache: dict[int, str] = {}
+
+
+def _reset_gmail_state_cache() -> None:
+    """Clear cached Gmail state (tests)."""
+    _gmail_state_cache.clear()
+
 
 def get_gmail_state(account: str = "default") -> str | None:
     """Get last processed Gmail history_id for an account."""
     state_id = _ACCOUNT_STATE_IDS.get(account, 1)
+    cached = _gmail_state_cache.get(state_id)
+    if cached is not None:
+        return cached
     session = get_session()
     try:
         state = session.query(GmailState).filter_by(id=state_id).first()
+        if state and state.last_history_id:
+            _gmail_state_cache[state_id] = state.last_history_id
         return state.last_history_id if state else None
     finally:
         session.close()
@@ -182,10 +235,12 @@ def set_gmail_state(history_id: str, account: str = "default") -> None:
         else:
             session.add(GmailState(id=state_id, last_history_id=history_id))
         session.commit()
+        _gmail_state_cache[state_id] = history_id
         logger.info("Gmail state updated: account=%s, history_id=%s", account, history_id)
     except Exception as e:
         logger.error("Failed to update Gmail state: %s", e)
         session.rollback()
+        _gmail_state_cache.pop(state_id, None)
     finally:
         session.close()
 
@@ -204,6 +259,45 @@ def email_already_processed(gmail_message_id: str) -> bool:
         session.close()
 
 
+def emails_already_processed(gmail_message_ids: list[str]) -> set[str]:
+    """Subset of gmail_message_ids that were already processed — one query."""
+    if not gmail_message_ids:
+        return set()
+    session = get_session()
+    try:
+        rows = (
+            session.query(EmailHistory.gmail_message_id)
+            .filter(EmailHistory.gmail_message_id.in_(set(gmail_message_ids)))
+            .all()
+        )
+        return {r[0] for r in rows}
+    finally:
+        session.close()
+
+
+def emails_processed_state(gmail_message_ids: list[str]) -> dict[str, bool]:
+    """{gmail_message_id: is_deferred} for the ids already in history — one query.
+
+    Ids never saved are absent. An id is deferred if any of its rows is
+    (same rule as email_is_deferred()).
+    """
+    if not gmail_message_ids:
+        return {}
+    session = get_session()
+    try:
+        rows = (
+            session.query(EmailHistory.gmail_message_id, EmailHistory.deferred)
+            .filter(EmailHistory.gmail_message_id.in_(set(gmail_message_ids)))
+            .all()
+        )
+        state: dict[str, bool] = {}
+        for msg_id, deferred in rows:
+            state[msg_id] = state.get(msg_id, False) or bool(deferred)
+        return state
+    finally:
+        session.close()
+
+
 def email_is_deferred(gmail_message_id: str) -> bool:
     """Check if an email is saved as deferred (needs manual processing)."""
     session = get_session()
@@ -265,6 +359,35 @@ def get_deferred_client_emails(reason: str = "unknown_client") -> list[str]:
 # Gmail thread history + merged full history
 # ---------------------------------------------------------------------------
 
+def _history_sort_key(h: dict) -> float:
+    """Chronological sort key; naive created_at (local DB) is UTC."""
+    dt = h["created_at"]
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.timestamp()
+
+
+def _merge_history(history: list[dict], gmail_history: list[dict], max_results: int) -> list[dict]:
+    """Merge Gmail messages into local history, oldest-first, last max_results.
+
+    Deduplicates by gmail_message_id (unique per message). Old approach used
+    (subject, direction) which collapsed all messages in a thread to at most
+    one inbound + one outbound.
+    """
+    seen_ids = {h["gmail_message_id"] for h in history if h.get("gmail_message_id")}
+    merged = list(history)
+    for gh in gmail_history:
+        gh_mid = gh.get("gmail_message_id")
+        if gh_mid:
+            if gh_mid in seen_ids:
+                continue  # already in local DB
+            seen_ids.add(gh_mid)
+        merged.append(gh)
+
+    merged.sort(key=_history_sort_key)
+    return merged[-max_results:]
+
+
 def get_full_email_history(
     client_email: str, max_results: int = 10, gmail_account: str = "default",
 ) -> list[dict]:
@@ -281,30 +404,7 @@ def get_full_email_history(
             client_email, max_results=max_results, gmail_account=gmail_account,
         )
         if gmail_history:
-            # Deduplicate by gmail_message_id (unique per message).
-            # Old approach used (subject, direction) which collapsed all messages
-            # in a thread to at most one inbound + one outbound.
-            local_msg_ids = {
-                h.get("gmail_message_id")
-                for h in history
-                if h.get("gmail_message_id")
-            }
-            for gh in gmail_history:
-                gh_mid = gh.get("gmail_message_id")
-                if gh_mid and gh_mid in local_msg_ids:
-                    continue  # already in local DB
-                history.append(gh)
-                if gh_mid:
-                    local_msg_ids.add(gh_mid)
-
-            def _sort_key(h):
-                dt = h["created_at"]
-                if dt.tzinfo is not None:
-                    return dt.timestamp()
-                return dt.replace(tzinfo=timezone.utc).timestamp()
-
-            history.sort(key=_sort_key)
-            history = history[-max_results:]
+            history = _merge_history(history, gmail_history, max_results)
 
     return history
 
@@ -329,28 +429,7 @@ def get_full_thread_history(
             max_results=fetch_limit,
         )
         if gmail_history:
-            # Deduplicate by gmail_message_id (unique per message).
-            local_msg_ids = {
-                h.get("gmail_message_id")
-                for h in history
-                if h.get("gmail_message_id")
-            }
-            for gh in gmail_history:
-                gh_mid = gh.get("gmail_message_id")
-                if gh_mid and gh_mid in local_msg_ids:
-                    continue
-                history.append(gh)
-                if gh_mid:
-                    local_msg_ids.add(gh_mid)
-
-            def _sort_key(h):
-                dt = h["created_at"]
-                if dt.tzinfo is not None:
-                    return dt.timestamp()
-                return dt.replace(tzinfo=timezone.utc).timestamp()
-
-            history.sort(key=_sort_key)
-            history = history[-max_results:]
+            history = _merge_history(history, gmail_history, max_results)
 
     return history
 
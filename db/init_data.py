@@ -10,15 +10,27 @@ Run:
 
 import logging
 
+from sqlalchemy import inspect
+
 from db.models import Base, Client, ClientOrderItem, engine, get_session
 
 logger = logging.getLogger(__name__)
 
 
-def init_default_data():
-    """Create all tables (clients, email history, etc.)."""
-    Base.metadata.create_all(engine)
-    logger.info("Tables created (or already exist).")
+def init_default_data(bind=None):
+    """Create all tables (clients, email history, etc.).
+
+    Lists existing tables with one query and only runs CREATE for missing
+    ones — create_all() alone probes every table separately on each start.
+    """
+    bind = bind if bind is not None else engine
+    existing = set(inspect(bind).get_table_names())
+    missing = [t for name, t in Base.metadata.tables.items() if name not in existing]
+    if missing:
+        Base.metadata.create_all(bind, tables=missing)
+        logger.info("Tables created: %s", ", ".join(t.name for t in missing))
+    else:
+        logger.info("Tables already exist.")
 
 
 if __name__ == "__main__":
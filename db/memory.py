@@ -31,6 +31,8 @@ from db.clients import (
 from db.email_history import (
     email_already_processed,
     email_is_deferred,
+    emails_already_processed,
+    emails_processed_state,
     finalize_deferred,
     get_deferred_client_emails,
     get_email_history,
@@ -40,6 +42,7 @@ from db.email_history import (
     get_gmail_thread_history,
     get_thread_history,
     save_email,
+    save_emails_bulk,
     set_gmail_state,
 )
 from db.product_resolver import resolve_order_items, resolve_product_to_catalog
@@ -85,6 +88,8 @@ __all__ = [
     # email
     "email_already_processed",
     "email_is_deferred",
+    "emails_already_processed",
+    "emails_processed_state",
     "finalize_deferred",
     "get_deferred_client_emails",
     "get_email_history",
@@ -94,6 +99,7 @@ __all__ = [
     "get_gmail_thread_history",
     "get_thread_history",
     "save_email",
+    "save_emails_bulk",
     "set_gmail_state",
     # product resolver
     "resolve_order_items",
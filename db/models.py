@@ -7,18 +7,64 @@ SQLAlchemy models for business data (clients, etc.).
 
 from datetime import datetime
 
-from sqlalchemy import Boolean, Column, DateTime, ForeignKey, Integer, String, Text, UniqueConstraint, create_engine
-from sqlalchemy.orm import DeclarativeBase, Session
+from sqlalchemy import (
+    Boolean,
+    Column,
+    DateTime,
+    ForeignKey,
+    Index,
+    Integer,
+    String,
+    Text,
+    UniqueConstraint,
+    create_engine,
+)
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import DeclarativeBase, Session, sessionmaker
+from sqlalchemy.sql.functions import FunctionElement
 
 from db.url import db_url
 
-engine = create_engine(db_url)
+# Single process-wide pool, shared with agno storage (see db.session).
+# pre_ping/recycle match agno's own engine defaults. The pool is sized for the
+# web workers plus the pipeline I/O threads and the poller running together.
+engine = create_engine(
+    db_url,
+    pool_size=10,
+    max_overflow=20,
+    pool_pre_ping=True,
+    pool_recycle=3600,
+)
+
+# Sessions are short-lived (one per db function) and results are converted to
+# dicts right after commit, so reloading every attribute on commit is wasted work.
+_session_factory = sessionmaker(bind=engine, expire_on_commit=False)
 
 
 class Base(DeclarativeBase):
     pass
 
 
+class utcnow(FunctionElement):
+    """Current UTC time evaluated by the database, as a naive timestamp.
+
+    Matches the datetime.utcnow() values stored in the naive DateTime columns.
+    """
+
+    type = DateTime()
+    inherit_cache = True
+
+
+@compiles(utcnow, "postgresql")
+def _pg_utcnow(element, compiler, **kw):
+    return "TIMEZONE('utc', CURRENT_TIMESTAMP)"
+
+
+@compiles(utcnow)
+def _default_utcnow(element, compiler, **kw):
+    return "CURRENT_TIMESTAMP"  # SQLite: already UTC
+
+
 class Client(Base):
     __tablename__ = "clients"
 
@@ -68,6 +114,13 @@ class EmailHistory(Base):
     deferred_reason = Column(String, nullable=True)  # "unknown_client" | "final_confirmation"
     created_at = Column(DateTime, default=datetime.utcnow)
 
+    # History reads filter by client or thread and take the newest rows first.
+    # Existing databases: scripts/migrate_email_history_indexes.py
+    __table_args__ = (
+        Index("ix_email_history_client_created", "client_email", created_at.desc()),
+        Index("ix_email_history_thread_created", "gmail_thread_id", created_at.desc()),
+    )
+
     def to_dict(self) -> dict:
         return {
             "client_email": self.client_email,
@@ -87,7 +140,8 @@ class GmailState(Base):
 
     id = Column(Integer, primary_key=True)
     last_history_id = Column(String, nullable=False)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # Written every poll cycle and never read back — let the DB stamp it
+    updated_at = Column(DateTime, server_default=utcnow(), onupdate=utcnow())
 
 
 class ConversationState(Base):
@@ -311,4 +365,4 @@ class ShippingJob(Base):
 
 def get_session() -> Session:
     """Create a new database session."""
-    return Session(engine)
+    return _session_factory()
@@ -3,6 +3,9 @@ Database Session
 ----------------
 
 PostgreSQL database connection for AgentOS.
+
+Agent storage, knowledge bases and business data all share the engine
+from db.models, so the process holds a single connection pool.
 """
 
 from agno.db.postgres import PostgresDb
@@ -10,13 +13,13 @@ from agno.knowledge import Knowledge
 from agno.knowledge.embedder.openai import OpenAIEmbedder
 from agno.vectordb.pgvector import PgVector, SearchType
 
-from db.url import db_url
+from db.models import engine
 
 DB_ID = "agentos-db"
 
 
 def get_postgres_db(contents_table: str | None = None) -> PostgresDb:
-    """Create a PostgresDb instance.
+    """Create a PostgresDb instance backed by the shared engine.
 
     Args:
         contents_table: Optional table name for storing knowledge contents.
@@ -25,8 +28,8 @@ def get_postgres_db(contents_table: str | None = None) -> PostgresDb:
         Configured PostgresDb instance.
     """
     if contents_table is not None:
-        return PostgresDb(id=DB_ID, db_url=db_url, knowledge_table=contents_table)
-    return PostgresDb(id=DB_ID, db_url=db_url)
+        return PostgresDb(id=DB_ID, db_engine=engine, knowledge_table=contents_table)
+    return PostgresDb(id=DB_ID, db_engine=engine)
 
 
 def create_knowledge(name: str, table_name: str) -> Knowledge:
@@ -42,7 +45,7 @@ def create_knowledge(name: str, table_name: str) -> Knowledge:
     return Knowledge(
         name=name,
         vector_db=PgVector(
-            db_url=db_url,
+            db_engine=engine,
             table_name=table_name,
             search_type=SearchType.hybrid,
             embedder=OpenAIEmbedder(id="text-embedding-3-small"),
@@ -0,0 +1,115 @@
+"""Add composite history indexes on email_history.
+
+Creates:
+    INDEX ix_email_history_client_created
+    ON email_history (client_email, created_at DESC)
+
+    INDEX ix_email_history_thread_created
+    ON email_history (gmail_thread_id, created_at DESC)
+
+get_email_history() and get_thread_history() filter by client/thread and
+read the newest rows first; with these indexes that is one index range scan
+instead of fetching every row for the client and sorting it.
+
+New databases get the indexes from Base.metadata.create_all(); this script
+is for databases created before they were added to the model.
+
+Usage:
+    # Create indexes (idempotent):
+    python scripts/migrate_email_history_indexes.py
+
+    # Rollback (drop indexes):
+    python scripts/migrate_email_history_indexes.py --rollback
+"""
+
+import argparse
+import logging
+
+from sqlalchemy import text
+
+logger = logging.getLogger(__name__)
+
+INDEXES = {
+    "ix_email_history_client_created": "email_history (client_email, created_at DESC)",
+    "ix_email_history_thread_created": "email_history (gmail_thread_id, created_at DESC)",
+}
+
+
+def _index_exists(conn, dialect_name: str, name: str) -> bool:
+    """Check if an index with this name exists."""
+    if dialect_name == "sqlite":
+        row = conn.execute(text(
+            "SELECT name FROM sqlite_master "
+            "WHERE type='index' AND name=:name"
+        ), {"name": name}).fetchone()
+    else:
+        # PostgreSQL
+        row = conn.execute(text(
+            "SELECT indexname FROM pg_indexes "
+            "WHERE indexname = :name"
+        ), {"name": name}).fetchone()
+    return row is not None
+
+
+def run_migration(*, rollback: bool = False, bind=None) -> dict:
+    """Core migration logic — testable with injected engine.
+
+    Args:
+        rollback: Drop the indexes instead of creating.
+        bind: SQLAlchemy engine. Defaults to db.models.engine.
+
+    Returns:
+        Report dict: {"action", "indexes": {name: status}}.
+    """
+    if bind is None:
+        from db.models import engine
+        bind = engine
+
+    report = {"action": "rollback" if rollback else "create", "indexes": {}}
+
+    with bind.connect() as conn:
+        dialect = bind.dialect.name
+        for name, target in INDEXES.items():
+            exists = _index_exists(conn, dialect, name)
+            if rollback:
+                if exists:
+                    conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
+                    logger.info("Index %s dropped", name)
+                    report["indexes"][name] = "dropped"
+                else:
+                    report["indexes"][name] = "noop"
+            elif exists:
+                logger.info("Index %s already exists, skipping", name)
+                report["indexes"][name] = "already_exists"
+            else:
+                conn.execute(text(f"CREATE INDEX {name} ON {target}"))
+                logger.info("Index %s created", name)
+                report["indexes"][name] = "created"
+        conn.commit()
+
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Add composite (client/thread, created_at DESC) indexes on email_history.",
+    )
+    parser.add_argument(
+        "--rollback", action="store_true",
+        help="Drop the indexes instead of creating.",
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s %(levelname)s %(name)s: %(message)s",
+    )
+
+    report = run_migration(rollback=args.rollback)
+
+    import json
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
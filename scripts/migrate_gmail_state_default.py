@@ -0,0 +1,45 @@
+"""Set a server-side UTC default on gmail_state.updated_at.
+
+GmailState.updated_at is stamped by the database (server_default plus a SQL
+onupdate). New databases get the default from Base.metadata.create_all();
+this script adds it to databases created before. SET DEFAULT is idempotent.
+SQLite cannot alter column defaults, so it is skipped there.
+
+Usage:
+    python scripts/migrate_gmail_state_default.py
+"""
+
+import logging
+
+from sqlalchemy import text
+
+logger = logging.getLogger(__name__)
+
+SET_DEFAULT_SQL = {
+    "postgresql": (
+        "ALTER TABLE gmail_state ALTER COLUMN updated_at "
+        "SET DEFAULT TIMEZONE('utc', CURRENT_TIMESTAMP)"
+    ),
+}
+
+
+def run_migration(*, bind=None) -> str:
+    """Set the default. Returns "set", or "unsupported" for other dialects."""
+    if bind is None:
+        from db.models import engine
+        bind = engine
+
+    sql = SET_DEFAULT_SQL.get(bind.dialect.name)
+    if sql is None:
+        logger.info("Dialect %s cannot alter column defaults, skipping", bind.dialect.name)
+        return "unsupported"
+
+    with bind.begin() as conn:
+        conn.execute(text(sql))
+    logger.info("Default on gmail_state.updated_at set")
+    return "set"
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    print(run_migration())
@@ -29,7 +29,7 @@ def db_session(monkeypatch):
     Base.metadata.create_all(engine)
 
     def _get_session():
-        return Session(engine)
+        return Session(engine, expire_on_commit=False)  # same as db.models.get_session
 
     # Patch DB access only in modules that are importable in the current test context.
     # Some unittest-style suites inject lightweight stubs (e.g. fake `db` package) that
@@ -94,3 +94,35 @@ def active_warehouses(monkeypatch):
     _reset_cache()
     yield
     _reset_cache()
+
+
+@pytest.fixture(autouse=True)
+def _reset_classifier_cache():
+    """Clear the classifier response cache between tests.
+
+    Looked up via sys.modules so conftest doesn't import agents.classifier
+    (and agno) before stub test files install their fakes.
+    """
+    yield
+    mod = sys.modules.get("agents.classifier")
+    reset = getattr(mod, "_reset_classifier_cache", None)
+    if reset is not None:
+        reset()
+
+
+@pytest.fixture(autouse=True)
+def _reset_db_caches():
+    """Clear in-process db read caches — every test gets a fresh DB."""
+    resets = [
+        getattr(sys.modules.get(module_name), reset_name, None)
+        for module_name, reset_name in (
+            ("db.clients", "_reset_client_cache"),
+            ("db.email_history", "_reset_gmail_state_cache"),
+        )
+    ]
+    resets = [r for r in resets if r is not None]
+    for reset in resets:
+        reset()
+    yield
+    for reset in resets:
+        reset()
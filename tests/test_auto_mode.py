@@ -9,6 +9,7 @@ from unittest.mock import MagicMock
 
 from db.email_history import (
     save_email,
+    save_emails_bulk,
     email_already_processed,
     email_is_deferred,
     finalize_deferred,
@@ -388,6 +389,77 @@ class TestDeferredDB:
         finalize_deferred("msg_007")
         assert not email_is_deferred("msg_007")
 
+    def test_save_emails_bulk_inserts_and_upserts(self, db_session):
+        """save_emails_bulk: same UPSERT semantics as save_email, one transaction."""
+        save_email(
+            client_email="test@example.com",
+            direction="inbound",
+            subject="Original",
+            body="Original body",
+            situation="other",
+            gmail_message_id="msg_bulk_1",
+            deferred=True,
+        )
+        save_emails_bulk([
+            {
+                "client_email": "Test@Example.com ",
+                "direction": "inbound",
+                "subject": "Changed",
+                "body": "Changed body",
+                "situation": "new_order",
+                "gmail_message_id": "msg_bulk_1",
+            },
+            {
+                "client_email": "Test@Example.com ",
+                "direction": "outbound",
+                "subject": "Re: Original",
+                "body": "Reply",
+                "situation": "new_order",
+                "gmail_thread_id": "thread_bulk",
+            },
+        ])
+        session = db_session()
+        rows = session.query(EmailHistory).order_by(EmailHistory.id).all()
+        assert len(rows) == 2
+        inbound, outbound = rows
+        assert inbound.subject == "Original"
+        assert inbound.situation == "new_order"
+        assert inbound.deferred is False
+        assert outbound.client_email == "test@example.com"
+        assert outbound.gmail_thread_id == "thread_bulk"
+        session.close()
+
+    def test_save_emails_bulk_duplicate_id_in_batch(self, db_session):
+        """A gmail_message_id repeated within one batch is inserted once."""
+        row = {
+            "client_email": "test@example.com",
+            "direction": "inbound",
+            "subject": "S",
+            "body": "B",
+            "situation": "other",
+            "gmail_message_id": "msg_bulk_dup",
+        }
+        save_emails_bulk([row, {**row, "situation": "new_order"}])
+        session = db_session()
+        rows = session.query(EmailHistory).filter_by(gmail_message_id="msg_bulk_dup").all()
+        assert len(rows) == 1
+        assert rows[0].situation == "new_order"
+        session.close()
+
+    def test_save_emails_bulk_empty_is_noop(self, db_session):
+        save_email(
+            client_email="test@example.com",
+            direction="inbound",
+            subject="S",
+            body="B",
+            situation="other",
+            gmail_message_id="msg_bulk_noop",
+        )
+        save_emails_bulk([])
+        session = db_session()
+        assert session.query(EmailHistory).count() == 1
+        session.close()
+
 
 # ═══════════════════════════════════════════════════════════════════════════
 # format_hold_result tests
@@ -528,11 +600,11 @@ class TestPipelineHoldIntegration:
         fake_classification.parser_used = False
 
         saved_emails = []
-        original_save = save_email
+        original_save = save_emails_bulk
 
-        def tracking_save(*args, **kwargs):
-            saved_emails.append(kwargs)
-            original_save(*args, **kwargs)
+        def tracking_save(records):
+            saved_emails.extend(records)
+            original_save(records)
 
         patches = [
             patch("agents.pipeline.build_classifier_context",
@@ -543,7 +615,7 @@ class TestPipelineHoldIntegration:
                   return_value=client_data),
             patch("agents.pipeline.get_stock_summary",
                   return_value={"total": 100}),
-            patch("agents.pipeline.save_email", side_effect=tracking_save),
+            patch("agents.pipeline.save_emails_bulk", side_effect=tracking_save),
             patch("agents.pipeline.save_order_items", return_value=None),
             patch("agents.pipeline.replace_order_items", return_value=0),
             patch("agents.pipeline.update_conversation_state", return_value={}),
@@ -720,7 +792,7 @@ class TestPollerPreReconcile:
         mock_client = MagicMock()
         mock_client.search_unread_from.return_value = [{"msg_id": "msg_def_001"}]
         mock_client.search_unread_order_notifications.return_value = []
-        mock_client.get_message.return_value = {
+        mock_client.get_messages.side_effect = lambda ids: {ids[0]: {
             "from": "c@example.com",
             "from_raw": "c@example.com",
             "reply_to": "",
@@ -729,7 +801,7 @@ class TestPollerPreReconcile:
             "gmail_message_id": "msg_def_001",
             "gmail_thread_id": "thread_def_001",
             "created_at": ts_inbound,
-        }
+        }}
         mock_client.fetch_thread.return_value = [
             {"direction": "inbound", "created_at": ts_inbound,
              "gmail_message_id": "msg_def_001", "client_email": "c@example.com"},
@@ -764,7 +836,7 @@ class TestPollerPreReconcile:
         mock_client = MagicMock()
         mock_client.search_unread_from.return_value = [{"msg_id": "msg_def_002"}]
         mock_client.search_unread_order_notifications.return_value = []
-        mock_client.get_message.return_value = {
+        mock_client.get_messages.side_effect = lambda ids: {ids[0]: {
             "from": "c@example.com",
             "from_raw": "c@example.com",
             "reply_to": "",
@@ -773,7 +845,7 @@ class TestPollerPreReconcile:
             "gmail_message_id": "msg_def_002",
             "gmail_thread_id": "thread_def_002",
             "created_at": ts_inbound,
-        }
+        }}
         mock_client.fetch_thread.return_value = [
             {"direction": "inbound", "created_at": ts_inbound,
              "gmail_message_id": "msg_def_002", "client_email": "c@example.com"},
@@ -791,3 +863,158 @@ class TestPollerPreReconcile:
         # auto_mode not passed (defaults to False for manual trigger)
         _, kwargs = mock_classify.call_args
         assert kwargs.get("auto_mode") is not True
+        # Manual reprocess never replays a cached classification
+        assert kwargs["bypass_cache"] is True
+
+
+@pytest.mark.skipif(_poller_mod is None, reason="tools.gmail_poller requires full agno stack")
+class TestPollerBatch:
+    """New messages from one poll cycle go through the pipeline as one batch."""
+
+    def test_new_messages_processed_as_one_batch(self, db_session):
+        from unittest.mock import patch
+
+        save_email(
+            client_email="c@example.com", direction="inbound", subject="Old",
+            body="old", situation="other", gmail_message_id="msg_old",
+        )
+        mock_client = MagicMock()
+        mock_client.get_new_messages.return_value = [
+            {"msg_id": "msg_a", "history_id": "11"},
+            {"msg_id": "msg_old", "history_id": "12"},
+            {"msg_id": "msg_b", "history_id": "13"},
+            {"msg_id": "msg_a", "history_id": "14"},
+        ]
+        mock_client.get_messages.side_effect = lambda ids: {
+            msg_id: {"from": "c@example.com", "subject": msg_id, "body": "hi", "gmail_thread_id": f"t_{msg_id}"}
+            for msg_id in ids
+        }
+        mock_batch = MagicMock(side_effect=lambda emails, **kw: [f"done {e['gmail_message_id']}" for e in emails])
+
+        with patch.object(_poller_mod, "_get_client", return_value=mock_client), \
+             patch.object(_poller_mod, "get_gmail_state", return_value="10"), \
+             patch.object(_poller_mod, "set_gmail_state") as mock_set_state, \
+             patch.object(_poller_mod, "classify_and_process_batch", mock_batch), \
+             patch.object(_poller_mod, "_send_telegram_result") as mock_send:
+            processed = _poller_mod._poll_gmail_locked("default")
+
+        assert processed == 2
+        mock_batch.assert_called_once()
+        emails = mock_batch.call_args.args[0]
+        assert [e["gmail_message_id"] for e in emails] == ["msg_a", "msg_b"]
+        assert mock_batch.call_args.kwargs == {"gmail_account": "default", "auto_mode": True}
+        mock_client.get_messages.assert_called_once_with(["msg_a", "msg_b"])
+        assert [c.args[1] for c in mock_send.call_args_list] == ["done msg_a", "done msg_b"]
+        mock_set_state.assert_called_once_with("13", "default")
+
+    def test_merged_same_thread_messages_saved_together(self, db_session):
+        from datetime import datetime, timedelta, timezone
+        from unittest.mock import patch
+
+        base = datetime(2026, 3, 23, 10, 0, tzinfo=timezone.utc)
+        messages = {
+            f"msg_m{i}": {
+                "from": "c@example.com", "subject": f"Part {i}", "body": f"part {i}",
+                "gmail_thread_id": "thread_m", "created_at": base + timedelta(minutes=i),
+            }
+            for i in range(3)
+        }
+        mock_client = MagicMock()
+        mock_client.search_unread_from.return_value = [{"msg_id": m} for m in messages]
+        mock_client.search_unread_order_notifications.return_value = []
+        mock_client.get_messages.side_effect = lambda ids: {m: messages[m] for m in ids}
+
+        with patch.object(_poller_mod, "_get_client", return_value=mock_client), \
+             patch.object(_poller_mod, "getenv", return_value="fake_token"), \
+             patch.object(_poller_mod, "classify_and_process", return_value="ok"), \
+             patch.object(_poller_mod, "_send_telegram_result"), \
+             patch.object(_poller_mod, "save_emails_bulk", wraps=save_emails_bulk) as bulk:
+            _poller_mod.process_client_email("c@example.com")
+
+        bulk.assert_called_once()
+        assert [r["gmail_message_id"] for r in bulk.call_args.args[0]] == ["msg_m0", "msg_m1"]
+        assert email_already_processed("msg_m0") and email_already_processed("msg_m1")
+
+
+@pytest.mark.skipif(_poller_mod is None, reason="tools.gmail_poller requires full agno stack")
+class TestSendTelegramResult:
+
+    def test_dynamic_content_html_escaped(self):
+        from unittest.mock import patch
+
+        msg = {"from": "a&b@example.com", "subject": "Re: <Order> & more"}
+        with patch.object(_poller_mod, "send_telegram") as mock_send:
+            _poller_mod._send_telegram_result(msg, "price < $100 &lt; ok")
+
+        text = mock_send.call_args.args[0]
+        assert "<b>От:</b> a&amp;b@example.com\n" in text
+        assert "<b>Тема:</b> Re: &lt;Order&gt; &amp; more\n" in text
+        assert "<pre>price &lt; $100 &amp;lt; ok</pre>" in text
+
+    def test_long_result_truncated_before_escaping(self):
+        from unittest.mock import patch
+
+        msg = {"from": "c@example.com", "subject": "S" * 500}
+        with patch.object(_poller_mod, "send_telegram") as mock_send:
+            _poller_mod._send_telegram_result(msg, "<" * 5000)
+
+        text = mock_send.call_args.args[0]
+        assert "<pre>" + "&lt;" * _poller_mod._RESULT_MAX_CHARS + "\n... (truncated)</pre>" in text
+        assert "<b>Тема:</b> " + "S" * _poller_mod._SUBJECT_MAX_CHARS + "...\n" in text
+
+
+@pytest.mark.skipif(_poller_mod is None, reason="tools.gmail_poller requires full agno stack")
+class TestGmailPush:
+
+    def test_watch_renewed_only_near_expiry(self, monkeypatch):
+        import time
+        from unittest.mock import patch
+
+        now_ms = int(time.time() * 1000)
+        mock_client = MagicMock()
+        mock_client.watch.return_value = {"historyId": "5", "expiration": str(now_ms + 7 * 86400 * 1000)}
+        monkeypatch.setenv("GMAIL_REFRESH_TOKEN", "t")
+        monkeypatch.delenv("GMAIL_REFRESH_TOKEN_TILDA", raising=False)
+        monkeypatch.setattr(_poller_mod, "_watch_expirations", {})
+
+        with patch.object(_poller_mod, "_get_client", return_value=mock_client):
+            assert _poller_mod.renew_gmail_watches("projects/p/topics/gmail") == 1
+            assert _poller_mod.renew_gmail_watches("projects/p/topics/gmail") == 0
+            _poller_mod._watch_expirations["default"] = now_ms + 3600 * 1000
+            assert _poller_mod.renew_gmail_watches("projects/p/topics/gmail") == 1
+            assert _poller_mod.renew_gmail_watches("") == 0
+
+        mock_client.watch.assert_called_with("projects/p/topics/gmail")
+        assert mock_client.watch.call_count == 2
+
+    def test_push_notification_runs_one_poll(self):
+        import base64
+        import json
+        from unittest.mock import patch
+
+        data = base64.b64encode(json.dumps({"emailAddress": "a@example.com", "historyId": 42}).encode())
+        envelope = {"message": {"data": data.decode(), "messageId": "1"}, "subscription": "s"}
+
+        with patch.object(_poller_mod, "poll_gmail", return_value=3) as poll:
+            assert _poller_mod.handle_push_notification(envelope) == 3
+            assert _poller_mod.handle_push_notification({"message": {"data": "%%"}}) == 3
+
+        assert poll.call_count == 2
+
+    def test_trigger_during_poll_reruns_cycle(self):
+        from unittest.mock import patch
+
+        nested = []
+
+        def _cycle():
+            # A push arriving mid-poll: returns at once, holder runs again
+            if not nested:
+                nested.append(_poller_mod.poll_gmail())
+            return 1
+
+        with patch.object(_poller_mod, "_poll_cycle", side_effect=_cycle) as cycle:
+            assert _poller_mod.poll_gmail() == 2
+
+        assert nested == [0]
+        assert cycle.call_count == 2
+        assert not _poller_mod._poll_requested.is_set()
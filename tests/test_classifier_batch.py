@@ -0,0 +1,148 @@
+"""Tests for batch classification.
+
+Covers:
+- run_classification_batch(): one LLM call per chunk, order preserved
+- {"results": [...]} answer and bare array both accepted
+- Wrong-shaped batch answer → per-email fallback
+- Deterministic paths never reach the LLM
+- classify_and_process_batch(): same thread/sender emails are not pre-classified
+"""
+
+import json
+import types
+from unittest.mock import patch
+
+from agents import classifier, pipeline
+from agents.classifier import run_classification_batch
+
+
+def _email(sender, body):
+    return f"From: {sender}\nSubject: Question\nBody: {body}"
+
+
+def _obj(sender, situation="other"):
+    return {"needs_reply": True, "situation": situation, "client_email": sender}
+
+
+def _response(data):
+    return types.SimpleNamespace(content=json.dumps(data))
+
+
+class TestRunClassificationBatch:
+
+    def test_one_call_for_chunk_order_preserved(self):
+        senders = ["a@example.com", "b@example.com", "c@example.com"]
+        requests = [(_email(s, f"question {n}"), "", None, None) for n, s in enumerate(senders)]
+        answer = {"results": [_obj(senders[0], "price_question"), _obj(senders[1]), _obj(senders[2], "new_order")]}
+
+        with patch.object(classifier.classifier_agent, "run", return_value=_response(answer)) as run:
+            results = run_classification_batch(requests)
+
+        assert run.call_count == 1
+        prompt = run.call_args[0][0]
+        assert "---EMAIL 1---" in prompt and "---EMAIL 3---" in prompt
+        assert '{"results": [...]}' in prompt
+        assert [r.situation for r in results] == ["price_question", "other", "new_order"]
+        assert [r.client_email for r in results] == senders
+
+    def test_chunks_capped(self):
+        n = classifier.BATCH_CLASSIFY_MAX + 1
+        requests = [(_email(f"c{i}@example.com", f"q {i}"), "", None, None) for i in range(n)]
+
+        def _run(prompt):
+            count = prompt.count("---EMAIL ")
+            return _response({"results": [_obj("x@example.com")] * count} if count else _obj("x@example.com"))
+
+        with patch.object(classifier.classifier_agent, "run", side_effect=_run) as run:
+            results = run_classification_batch(requests)
+
+        # 8 in one batch call + 1 single call
+        assert run.call_count == 2
+        assert len(results) == n
+
+    def test_wrong_shape_falls_back_to_single_calls(self):
+        requests = [(_email("a@example.com", "q1"), "", None, None),
+                    (_email("b@example.com", "q2"), "", None, None)]
+        responses = [
+            _response({"results": [_obj("a@example.com")]}),  # batch: 1 object for 2 emails
+            _response(_obj("a@example.com", "price_question")),
+            _response(_obj("b@example.com", "tracking")),
+        ]
+        with patch.object(classifier.classifier_agent, "run", side_effect=responses) as run:
+            results = run_classification_batch(requests)
+
+        assert run.call_count == 3
+        assert [r.situation for r in results] == ["price_question", "tracking"]
+
+    def test_bare_array_accepted(self):
+        requests = [(_email("a@example.com", "q1"), "", None, None),
+                    (_email("b@example.com", "q2"), "", None, None)]
+        answer = [_obj("a@example.com", "tracking"), _obj("b@example.com")]
+        with patch.object(classifier.classifier_agent, "run", return_value=_response(answer)) as run:
+            results = run_classification_batch(requests)
+
+        assert run.call_count == 1
+        assert [r.situation for r in results] == ["tracking", "other"]
+
+    def test_single_object_answer_falls_back(self):
+        """Model followed the single-email format for a batch prompt."""
+        requests = [(_email("a@example.com", "q1"), "", None, None),
+                    (_email("b@example.com", "q2"), "", None, None)]
+        responses = [_response(_obj("a@example.com"))] * 3
+        with patch.object(classifier.classifier_agent, "run", side_effect=responses) as run:
+            results = run_classification_batch(requests)
+
+        assert run.call_count == 3
+        assert len(results) == 2
+
+    def test_deterministic_skips_llm(self):
+        state = {"status": "awaiting_payment", "facts": {"order_id": "1", "payment_request_sent": True}}
+        requests = [
+            (_email("a@example.com", "Done, thanks"), "", state, None),
+            (_email("b@example.com", "Do you ship to Texas?"), "", None, None),
+        ]
+        with patch.object(classifier.classifier_agent, "run",
+                          return_value=_response(_obj("b@example.com"))) as run:
+            results = run_classification_batch(requests)
+
+        assert run.call_count == 1
+        assert "---EMAIL" not in run.call_args[0][0]
+        assert results[0].situation == "payment_received"
+        assert results[1].situation == "other"
+
+    def test_batch_answers_fill_single_cache(self):
+        requests = [(_email("a@example.com", "q1"), "", None, None),
+                    (_email("b@example.com", "q2"), "", None, None)]
+        answer = {"results": [_obj("a@example.com", "tracking"), _obj("b@example.com")]}
+        with patch.object(classifier.classifier_agent, "run", return_value=_response(answer)) as run:
+            run_classification_batch(requests)
+            single = classifier.run_classification(*requests[0])
+
+        assert run.call_count == 1
+        assert single.situation == "tracking"
+
+
+class TestClassifyAndProcessBatch:
+
+    def test_same_thread_and_sender_classified_later(self):
+        emails = [
+            {"email_text": _email("a@example.com", "first"), "gmail_message_id": "m1", "gmail_thread_id": "t1"},
+            {"email_text": _email("b@example.com", "other"), "gmail_message_id": "m2", "gmail_thread_id": "t2"},
+            {"email_text": _email("c@example.com", "same thread"), "gmail_message_id": "m3", "gmail_thread_id": "t1"},
+            {"email_text": _email("a@example.com", "same sender"), "gmail_message_id": "m4", "gmail_thread_id": "t3"},
+        ]
+        calls = []
+
+        def _fake_process(email_text, message_id, thread_id, account, auto_mode, preclassified=None):
+            calls.append((message_id, preclassified is not None))
+            return message_id
+
+        with patch.object(pipeline, "build_classifier_context", return_value=("", None, None)), \
+             patch.object(pipeline, "run_classification_batch",
+                          side_effect=lambda reqs: [object() for _ in reqs]) as batch, \
+             patch.object(pipeline, "_classify_and_process", side_effect=_fake_process):
+            results = pipeline.classify_and_process_batch(emails)
+
+        assert results == ["m1", "m2", "m3", "m4"]
+        assert len(batch.call_args[0][0]) == 2
+        assert calls == [("m1", True), ("m2", True), ("m3", False), ("m4", False)]
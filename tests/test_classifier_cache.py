@@ -0,0 +1,82 @@
+"""Tests for the classifier response cache in agents.classifier.
+
+Covers:
+- Identical classifier input → second call served from cache (no LLM call)
+- Different context → cache miss (thread state is part of the key)
+- Unparseable or invalid LLM output is not cached
+- bypass_cache: LLM asked again, fresh answer replaces the cached one
+"""
+
+import json
+import types
+from unittest.mock import patch
+
+import pytest
+from pydantic import ValidationError
+
+from agents import classifier
+from agents.classifier import run_classification
+
+EMAIL = "From: client@example.com\nSubject: Question\n\nDo you ship to Texas?"
+LLM_JSON = json.dumps({"needs_reply": True, "situation": "other", "client_email": "client@example.com"})
+
+
+def _response(content):
+    return types.SimpleNamespace(content=content)
+
+
+class TestClassifierCache:
+
+    def test_identical_input_hits_cache(self):
+        with patch.object(classifier.classifier_agent, "run", return_value=_response(LLM_JSON)) as run:
+            first = run_classification(EMAIL, "CTX\n")
+            second = run_classification(EMAIL, "CTX\n")
+
+        assert run.call_count == 1
+        assert first.situation == second.situation == "other"
+        assert classifier._classifier_cache_stats == {"hits": 1, "misses": 1}
+
+    def test_cached_result_is_fresh_object(self):
+        """Downstream code mutates classifications — hits must not share instances."""
+        with patch.object(classifier.classifier_agent, "run", return_value=_response(LLM_JSON)):
+            first = run_classification(EMAIL, "")
+            first.situation = "new_order"
+            second = run_classification(EMAIL, "")
+
+        assert second.situation == "other"
+
+    def test_different_context_misses(self):
+        with patch.object(classifier.classifier_agent, "run", return_value=_response(LLM_JSON)) as run:
+            run_classification(EMAIL, "CTX A\n")
+            run_classification(EMAIL, "CTX B\n")
+
+        assert run.call_count == 2
+
+    def test_invalid_json_not_cached(self):
+        with patch.object(classifier.classifier_agent, "run", return_value=_response("not json")), \
+             pytest.raises(json.JSONDecodeError):
+            run_classification(EMAIL, "")
+        with patch.object(classifier.classifier_agent, "run", return_value=_response(LLM_JSON)) as run:
+            result = run_classification(EMAIL, "")
+
+        assert run.call_count == 1
+        assert result.situation == "other"
+
+    def test_invalid_classification_not_cached(self):
+        invalid = json.dumps({"needs_reply": "maybe", "situation": "other"})
+        with patch.object(classifier.classifier_agent, "run", return_value=_response(invalid)), \
+             pytest.raises(ValidationError):
+            run_classification(EMAIL, "")
+
+        assert len(classifier._classifier_cache) == 0
+
+    def test_bypass_cache_refreshes_entry(self):
+        fixed = json.dumps({"needs_reply": True, "situation": "tracking", "client_email": "client@example.com"})
+        with patch.object(classifier.classifier_agent, "run", return_value=_response(LLM_JSON)):
+            run_classification(EMAIL, "")
+        with patch.object(classifier.classifier_agent, "run", return_value=_response(fixed)) as run:
+            manual = run_classification(EMAIL, "", bypass_cache=True)
+            again = run_classification(EMAIL, "")
+
+        assert run.call_count == 1
+        assert manual.situation == again.situation == "tracking"
@@ -95,7 +95,7 @@ def test_decrement_discount():
         "disc@example.com", "Disc", "prepay",
         discount_percent=10, discount_orders_left=2,
     )
-    decrement_discount("disc@example.com")
+    assert decrement_discount("disc@example.com") is True
     client = get_client("disc@example.com")
     assert client["discount_orders_left"] == 1
     assert client["discount_percent"] == 10
@@ -114,7 +114,7 @@ def test_decrement_discount_resets_at_zero():
 
 def test_decrement_discount_no_discount():
     add_client("nodis@example.com", "No", "prepay")
-    decrement_discount("nodis@example.com")
+    assert decrement_discount("nodis@example.com") is False
     client = get_client("nodis@example.com")
     assert client["discount_orders_left"] == 0
     assert client["discount_percent"] == 0
@@ -296,3 +296,67 @@ def test_to_dict_includes_address():
     assert "city_state_zip" in client
     assert client["street"] == ""
     assert client["city_state_zip"] == ""
+
+
+def test_get_client_served_from_cache(db_session, monkeypatch):
+    import db.clients as clients_module
+
+    add_client("cache@example.com", "Cached", "prepay")
+    assert get_client("cache@example.com")["name"] == "Cached"
+
+    def _no_session():
+        raise AssertionError("cache miss")
+
+    monkeypatch.setattr(clients_module, "get_session", _no_session)
+    found = get_client(" CACHE@example.com")
+    assert found["name"] == "Cached"
+
+    # Callers may mutate the returned dict — the cached copy must not change
+    found["name"] = "Mutated"
+    assert get_client("cache@example.com")["name"] == "Cached"
+
+
+def test_mutators_invalidate_client_cache():
+    add_client("inv@example.com", "Before", "prepay", discount_percent=10, discount_orders_left=1)
+    assert get_client("inv@example.com")["name"] == "Before"
+    assert [c["name"] for c in list_clients()] == ["Before"]
+
+    update_client("inv@example.com", name="After")
+    assert get_client("inv@example.com")["name"] == "After"
+    assert [c["name"] for c in list_clients()] == ["After"]
+
+    decrement_discount("inv@example.com")
+    assert get_client("inv@example.com")["discount_percent"] == 0
+
+    update_client_notes("inv@example.com", "vip")
+    assert get_client("inv@example.com")["notes"] == "vip"
+
+    delete_client("inv@example.com")
+    assert get_client("inv@example.com") is None
+    assert list_clients() == []
+
+
+def test_get_client_single_narrow_select():
+    from sqlalchemy import event
+
+    import db.clients as clients_module
+
+    add_client("narrow@example.com", "Narrow", "prepay")
+    update_client_notes("narrow@example.com", "vip")
+    clients_module._reset_client_cache()
+    engine = clients_module.get_session().get_bind()
+    statements = []
+
+    def _capture(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", _capture)
+    try:
+        client = get_client("narrow@example.com")
+    finally:
+        event.remove(engine, "before_cursor_execute", _capture)
+
+    assert client["notes"] == "vip"
+    # to_dict() must not trigger lazy loads for columns left out of load_only
+    assert len(statements) == 1
+    assert "created_at" not in statements[0]
@@ -350,6 +350,96 @@ def test_build_context_without_thread_id():
     mock_thread.assert_not_called()
 
 
+def _prefetch(key, history=None, error=None):
+    from concurrent.futures import Future
+
+    future = Future()
+    if error:
+        future.set_exception(error)
+    else:
+        future.set_result(history)
+    return key, future
+
+
+def _no_thread_result(**extra):
+    return {
+        "client_email": "pre@example.com",
+        "client_name": None,
+        "client_found": False,
+        "situation": "other",
+        "conversation_state": None,
+        **extra,
+    }
+
+
+def test_build_context_uses_matching_prefetch():
+    """A prefetch for the same client is used instead of loading history again."""
+    from agents.models import EmailClassification
+
+    classification = EmailClassification(needs_reply=True, situation="other", client_email="pre@example.com")
+    history = [{"direction": "inbound", "subject": "Hi", "body": "prefetched body"}]
+    result = _no_thread_result(history_prefetch=_prefetch(("client", "pre@example.com"), history))
+
+    with (
+        patch("agents.context.get_full_thread_history") as mock_thread,
+        patch("agents.context.get_full_email_history") as mock_email,
+    ):
+        ctx = build_context(classification, result, "Hello")
+
+    mock_email.assert_not_called()
+    mock_thread.assert_not_called()
+    assert "prefetched body" in ctx.history_text
+
+
+def test_build_context_discards_mismatched_prefetch():
+    """Prefetch for another sender is ignored — history loaded for the classified client."""
+    from agents.models import EmailClassification
+
+    classification = EmailClassification(needs_reply=True, situation="other", client_email="pre@example.com")
+    result = _no_thread_result(history_prefetch=_prefetch(("client", "other@example.com"), []))
+
+    with patch("agents.context.get_full_email_history", return_value=[]) as mock_email:
+        build_context(classification, result, "Hello")
+
+    mock_email.assert_called_once_with("pre@example.com", max_results=10)
+
+
+def test_build_context_failed_prefetch_loads_sync():
+    from agents.models import EmailClassification
+
+    classification = EmailClassification(needs_reply=True, situation="other", client_email="pre@example.com")
+    result = _no_thread_result(
+        history_prefetch=_prefetch(("client", "pre@example.com"), error=RuntimeError("gmail down")),
+    )
+
+    with patch("agents.context.get_full_email_history", return_value=[]) as mock_email:
+        build_context(classification, result, "Hello")
+
+    mock_email.assert_called_once_with("pre@example.com", max_results=10)
+
+
+def test_pipeline_lookup_client_uses_matching_prefetch():
+    """The speculative client lookup is reused when it was for the classified email."""
+    from agents.pipeline import _lookup_client
+
+    client = {"email": "pre@example.com", "name": "Pre"}
+    with patch("agents.pipeline.get_client") as mock_get:
+        found = _lookup_client("Pre@Example.com ", _prefetch("pre@example.com", client))
+
+    assert found == client
+    mock_get.assert_not_called()
+
+
+def test_pipeline_lookup_client_mismatch_or_failure_queries_sync():
+    from agents.pipeline import _lookup_client
+
+    with patch("agents.pipeline.get_client", return_value=None) as mock_get:
+        _lookup_client("other@example.com", _prefetch("pre@example.com", {"name": "Pre"}))
+        _lookup_client("pre@example.com", _prefetch("pre@example.com", error=RuntimeError("db down")))
+
+    assert [c.args for c in mock_get.call_args_list] == [("other@example.com",), ("pre@example.com",)]
+
+
 def test_build_context_with_profile(db_session):
     """build_context uses get_client_profile for enriched data."""
     from agents.models import EmailClassification
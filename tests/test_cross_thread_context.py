@@ -60,6 +60,7 @@ def _ensure_stubs():
         db_memory.get_full_email_history = lambda *a, **kw: []
         db_memory.get_full_thread_history = lambda *a, **kw: []
         db_memory.save_email = lambda *a, **kw: None
+        db_memory.save_emails_bulk = lambda *a, **kw: None
         db_memory.save_order_items = lambda *a, **kw: None
         db_memory.get_client = lambda *a, **kw: None
         db_memory.decrement_discount = lambda *a, **kw: None
@@ -72,6 +72,7 @@ def _install_import_stubs() -> None:
     db_memory = types.ModuleType("db.memory")
     db_memory.get_full_email_history = lambda *args, **kwargs: []
     db_memory.save_email = lambda *args, **kwargs: None
+    db_memory.save_emails_bulk = lambda *args, **kwargs: None
     db_memory.save_order_items = lambda *args, **kwargs: None
     db_memory.get_client = lambda *args, **kwargs: None
     db_memory.decrement_discount = lambda *args, **kwargs: None
@@ -292,7 +293,7 @@ class TestEmailPipelineSmoke(unittest.TestCase):
                 "select_best_alternatives",
                 side_effect=self._select_best_alternatives,
             ),
-            patch.object(self.agents_pipeline, "save_email", side_effect=self._save_email),
+            patch.object(self.agents_pipeline, "save_emails_bulk", side_effect=self._save_emails_bulk),
             patch.object(self.agents_pipeline, "save_order_items", return_value=None),
             patch.object(self.agents_pipeline, "replace_order_items", return_value=0),
             patch.object(self.agents_notifier, "send_telegram", side_effect=self._send_telegram),
@@ -317,8 +318,8 @@ class TestEmailPipelineSmoke(unittest.TestCase):
             p.stop()
 
     # ----- fake infra -----
-    def _save_email(self, **kwargs):
-        self.saved.append(kwargs)
+    def _save_emails_bulk(self, records):
+        self.saved.extend(records)
 
     def _send_telegram(self, text: str):
         self.telegrams.append(text)
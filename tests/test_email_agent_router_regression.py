@@ -71,6 +71,7 @@ def _install_import_stubs() -> None:
     db_memory = types.ModuleType("db.memory")
     db_memory.get_full_email_history = lambda *args, **kwargs: []
     db_memory.save_email = lambda *args, **kwargs: None
+    db_memory.save_emails_bulk = lambda *args, **kwargs: None
     db_memory.save_order_items = lambda *args, **kwargs: None
     db_memory.get_client = lambda *args, **kwargs: None
     db_memory.decrement_discount = lambda *args, **kwargs: None
@@ -265,17 +266,56 @@ class TestEmailAgentRouterRegression(unittest.TestCase):
             patch.object(self.agents_pipeline, "process_classified_email", return_value=processed),
             patch.object(self.agents_pipeline, "format_result", return_value="FORMATTED"),
             patch.object(self.agents_pipeline, "route_to_handler", return_value=routed) as route_mock,
-            patch.object(self.agents_pipeline, "save_email") as save_email_mock,
+            patch.object(self.agents_pipeline, "save_emails_bulk") as save_mock,
             patch.object(self.agents_notifier, "send_telegram"),
         ):
             out = self._run(self._classifier_payload(situation="new_order"))
 
         self.assertEqual(out, "FORMATTED")
         route_mock.assert_called_once()
-        self.assertEqual(save_email_mock.call_count, 2)
-        self.assertEqual(save_email_mock.call_args_list[0].kwargs["direction"], "inbound")
-        self.assertEqual(save_email_mock.call_args_list[1].kwargs["direction"], "outbound")
-        self.assertEqual(save_email_mock.call_args_list[1].kwargs["body"], "Template reply")
+        save_mock.assert_called_once()
+        rows = save_mock.call_args.args[0]
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(rows[0]["direction"], "inbound")
+        self.assertEqual(rows[1]["direction"], "outbound")
+        self.assertEqual(rows[1]["body"], "Template reply")
+
+    def test_templated_situations_skip_history_prefetch(self):
+        for situation in ("new_order", "payment_received", "tracking", "price_question", "stock_question"):
+            with self.subTest(situation=situation):
+                processed = self._base_result(situation=situation)
+                routed = self._base_result(
+                    situation=situation, template_used=True, draft_reply="Template reply", needs_routing=False,
+                )
+                with (
+                    patch.object(self.agents_pipeline, "process_classified_email", return_value=processed),
+                    patch.object(self.agents_pipeline, "format_result", return_value="FORMATTED"),
+                    patch.object(self.agents_pipeline, "route_to_handler", return_value=routed),
+                    patch.object(self.agents_pipeline, "save_emails_bulk"),
+                    patch.object(self.agents_pipeline, "load_history") as history_mock,
+                    patch.object(self.agents_notifier, "send_telegram"),
+                ):
+                    self._run(self._classifier_payload(situation=situation))
+
+                history_mock.assert_not_called()
+
+    def test_general_route_prefetches_history(self):
+        processed = self._base_result(situation="other")
+        routed = self._base_result(draft_reply="LLM reply", needs_routing=False)
+        with (
+            patch.object(self.agents_pipeline, "process_classified_email", return_value=processed),
+            patch.object(self.agents_pipeline, "format_result", return_value="FORMATTED"),
+            patch.object(self.agents_pipeline, "route_to_handler", return_value=routed) as route_mock,
+            patch.object(self.agents_pipeline, "save_emails_bulk"),
+            patch.object(self.agents_pipeline, "load_history", return_value=[]) as history_mock,
+            patch.object(self.agents_notifier, "send_telegram"),
+        ):
+            self._run(self._classifier_payload(situation="other"))
+            key, future = route_mock.call_args.args[1]["history_prefetch"]
+            self.assertEqual(future.result(timeout=5), [])
+
+        self.assertEqual(key, ("client", "client@example.com"))
+        history_mock.assert_called_once_with(None, "client@example.com")
 
     def test_no_reply_path_keeps_inbound_only(self):
         processed = self._base_result(
@@ -288,15 +328,119 @@ class TestEmailAgentRouterRegression(unittest.TestCase):
             patch.object(self.agents_pipeline, "process_classified_email", return_value=processed),
             patch.object(self.agents_pipeline, "format_result", return_value="NO_REPLY"),
             patch.object(self.agents_pipeline, "route_to_handler") as route_mock,
-            patch.object(self.agents_pipeline, "save_email") as save_email_mock,
+            patch.object(self.agents_pipeline, "save_emails_bulk") as save_mock,
             patch.object(self.agents_notifier, "send_telegram"),
         ):
             out = self._run(self._classifier_payload(situation="other", needs_reply=False))
 
         self.assertEqual(out, "NO_REPLY")
         route_mock.assert_not_called()
-        self.assertEqual(save_email_mock.call_count, 1)
-        self.assertEqual(save_email_mock.call_args.kwargs["direction"], "inbound")
+        save_mock.assert_called_once()
+        rows = save_mock.call_args.args[0]
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]["direction"], "inbound")
+
+    def _run_in_thread(self, payload: dict, pre_state_record=None) -> str:
+        with (
+            patch.object(
+                self.agents_classifier.classifier_agent,
+                "run",
+                return_value=types.SimpleNamespace(content=json.dumps(payload)),
+            ),
+            patch.object(
+                self.agents_pipeline, "build_classifier_context",
+                return_value=("", pre_state_record, None),
+            ),
+        ):
+            return self.email_agent.classify_and_process(
+                "From: client@example.com\nSubject: Test\nBody: hello",
+                gmail_message_id="msg-1",
+                gmail_thread_id="thread-1",
+            )
+
+    def _fail_after_draft(self, draft_id):
+        processed = self._base_result(situation="new_order")
+        routed = self._base_result(
+            situation="new_order", template_used=True, draft_reply="Template reply", needs_routing=False,
+        )
+        with (
+            patch.object(self.agents_pipeline, "process_classified_email", return_value=processed),
+            patch.object(self.agents_pipeline, "route_to_handler", return_value=routed),
+            patch.object(self.agents_pipeline, "_create_gmail_draft", return_value=draft_id) as draft_mock,
+            patch.object(self.agents_pipeline, "notify_oos_with_draft", side_effect=RuntimeError("boom")),
+            patch.object(self.agents_pipeline, "save_emails_bulk") as save_mock,
+            patch.object(self.agents_pipeline, "send_telegram") as alert_mock,
+        ):
+            out = self._run_in_thread(self._classifier_payload(situation="new_order"))
+
+        self.assertTrue(out.startswith("ERROR"))
+        draft_mock.assert_called_once()
+        # Error alert goes straight to the Telegram queue
+        alert_mock.assert_called_once()
+        self.assertIn("boom", alert_mock.call_args.args[0])
+        return save_mock
+
+    def test_failure_after_draft_still_records_email(self):
+        save_mock = self._fail_after_draft("draft-1")
+
+        save_mock.assert_called_once()
+        rows = save_mock.call_args.args[0]
+        self.assertEqual([r["direction"] for r in rows], ["inbound", "outbound"])
+        self.assertEqual(rows[0]["gmail_message_id"], "msg-1")
+
+    def test_failure_without_draft_leaves_email_unrecorded(self):
+        save_mock = self._fail_after_draft(None)
+        save_mock.assert_not_called()
+
+    def test_ignored_email_skips_state_and_notifications(self):
+        processed = self._base_result(
+            needs_reply=False,
+            client_found=False,
+            client_data=None,
+            draft_reply="(No reply needed)",
+            needs_routing=False,
+        )
+        with (
+            patch.object(self.agents_pipeline, "process_classified_email", return_value=processed),
+            patch.object(self.agents_pipeline, "format_result", return_value="NO_REPLY"),
+            patch.object(self.agents_pipeline, "_update_inbound_state") as state_mock,
+            patch.object(self.agents_pipeline, "notify_reply_ready") as notify_mock,
+            patch.object(self.agents_pipeline, "save_emails_bulk") as save_mock,
+            patch.object(self.agents_notifier, "send_telegram"),
+        ):
+            out = self._run_in_thread(self._classifier_payload(situation="other", needs_reply=False))
+
+        self.assertEqual(out, "NO_REPLY")
+        state_mock.assert_not_called()
+        notify_mock.assert_not_called()
+        save_mock.assert_called_once()
+        rows = save_mock.call_args.args[0]
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]["direction"], "inbound")
+        self.assertEqual(rows[0]["gmail_message_id"], "msg-1")
+
+    def test_no_reply_on_tracked_thread_still_updates_state(self):
+        processed = self._base_result(
+            needs_reply=False,
+            client_found=False,
+            client_data=None,
+            draft_reply="(No reply needed)",
+            needs_routing=False,
+        )
+        pre_state = {"state": {"status": "new"}}
+        with (
+            patch.object(self.agents_pipeline, "process_classified_email", return_value=processed),
+            patch.object(self.agents_pipeline, "format_result", return_value="NO_REPLY"),
+            patch.object(self.agents_pipeline, "_update_inbound_state", return_value=None) as state_mock,
+            patch.object(self.agents_pipeline, "save_emails_bulk"),
+            patch.object(self.agents_notifier, "send_telegram"),
+        ):
+            self._run_in_thread(
+                self._classifier_payload(situation="other", needs_reply=False),
+                pre_state_record=pre_state,
+            )
+
+        state_mock.assert_called_once()
 
     def test_router_reply_is_written_to_history(self):
         processed = self._base_result(
@@ -315,15 +459,17 @@ class TestEmailAgentRouterRegression(unittest.TestCase):
             patch.object(self.agents_pipeline, "process_classified_email", return_value=processed),
             patch.object(self.agents_pipeline, "route_to_handler", return_value=routed) as route_mock,
             patch.object(self.agents_pipeline, "format_result", side_effect=lambda r: r["draft_reply"]),
-            patch.object(self.agents_pipeline, "save_email") as save_email_mock,
+            patch.object(self.agents_pipeline, "save_emails_bulk") as save_mock,
             patch.object(self.agents_notifier, "send_telegram"),
         ):
             out = self._run(self._classifier_payload(situation="tracking"))
 
         self.assertEqual(out, "Handler text")
         route_mock.assert_called_once()
-        self.assertEqual(save_email_mock.call_count, 2)
-        self.assertEqual(save_email_mock.call_args_list[1].kwargs["body"], "Handler text")
+        save_mock.assert_called_once()
+        rows = save_mock.call_args.args[0]
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(rows[1]["body"], "Handler text")
 
     def test_router_dict_reply_replaces_result_object(self):
         processed = self._base_result(
@@ -340,15 +486,17 @@ class TestEmailAgentRouterRegression(unittest.TestCase):
             patch.object(self.agents_pipeline, "process_classified_email", return_value=processed),
             patch.object(self.agents_pipeline, "route_to_handler", return_value=routed) as route_mock,
             patch.object(self.agents_pipeline, "format_result", side_effect=lambda r: r["draft_reply"]),
-            patch.object(self.agents_pipeline, "save_email") as save_email_mock,
+            patch.object(self.agents_pipeline, "save_emails_bulk") as save_mock,
             patch.object(self.agents_notifier, "send_telegram"),
         ):
             out = self._run(self._classifier_payload(situation="shipping_timeline"))
 
         self.assertEqual(out, "Dict-based reply")
         route_mock.assert_called_once()
-        self.assertEqual(save_email_mock.call_count, 2)
-        self.assertEqual(save_email_mock.call_args_list[1].kwargs["body"], "Dict-based reply")
+        save_mock.assert_called_once()
+        rows = save_mock.call_args.args[0]
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(rows[1]["body"], "Dict-based reply")
 
     def test_oos_telegram_still_sent_with_draft_preview(self):
         processed = self._base_result(
@@ -368,7 +516,7 @@ class TestEmailAgentRouterRegression(unittest.TestCase):
             patch.object(self.agents_pipeline, "build_oos_message", return_value="OOS ALERT"),
             patch.object(self.agents_pipeline, "route_to_handler", return_value=routed),
             patch.object(self.agents_pipeline, "format_result", side_effect=lambda r: r["draft_reply"]),
-            patch.object(self.agents_pipeline, "save_email"),
+            patch.object(self.agents_pipeline, "save_emails_bulk"),
             patch.object(self.agents_notifier, "send_telegram") as send_telegram_mock,
         ):
             out = self._run(self._classifier_payload(situation="new_order"))
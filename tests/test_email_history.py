@@ -2,6 +2,8 @@
 
 from db.email_history import (
     email_already_processed,
+    emails_already_processed,
+    emails_processed_state,
     get_email_history,
     get_gmail_state,
     get_thread_history,
@@ -77,6 +79,41 @@ def test_email_history_priority_selection(db_session):
     assert order_count >= 4
 
 
+def test_email_history_priority_window_is_newest_50(db_session):
+    """Only the 50 newest messages compete; equal scores prefer newer."""
+    from datetime import datetime, timedelta
+    from db.models import EmailHistory
+
+    base = datetime(2025, 1, 1)
+    session = db_session()
+    situations = ["new_order"] * 5 + ["tracking"] * 40 + ["other"] * 12 + ["payment_question"] * 3
+    for i, situation in enumerate(situations):
+        session.add(EmailHistory(
+            client_email="window@example.com", direction="inbound",
+            subject=f"m{i}", body="body", situation=situation,
+            created_at=base + timedelta(hours=i),
+        ))
+    session.commit()
+    session.close()
+
+    subjects = [h["subject"] for h in get_email_history("window@example.com", max_total=6)]
+    # m0-m4 (new_order) fall outside the newest 50; m57-m59 are the 3 most recent;
+    # the 3 remaining slots go to the newest "other" rows (score 1 beats tracking's 0)
+    assert subjects == ["m54", "m55", "m56", "m57", "m58", "m59"]
+
+
+def test_gmail_state_cached_after_write(monkeypatch):
+    import db.email_history as eh
+
+    set_gmail_state("111", "tilda")
+
+    def _no_session():
+        raise AssertionError("gmail_state read hit the DB")
+
+    monkeypatch.setattr(eh, "get_session", _no_session)
+    assert get_gmail_state("tilda") == "111"
+
+
 def test_email_history_empty():
     assert get_email_history("nobody@example.com") == []
 
@@ -87,6 +124,20 @@ def test_email_already_processed():
     assert email_already_processed("msg999") is False
 
 
+def test_emails_already_processed():
+    save_email("dup@example.com", "inbound", "Test", "Body", "other", gmail_message_id="msg1")
+    save_email("dup@example.com", "inbound", "Test", "Body", "other", gmail_message_id="msg2")
+    assert emails_already_processed(["msg1", "msg3", "msg2", "msg1"]) == {"msg1", "msg2"}
+    assert emails_already_processed([]) == set()
+
+
+def test_emails_processed_state():
+    save_email("c@example.com", "inbound", "Test", "Body", "other", gmail_message_id="done")
+    save_email("c@example.com", "inbound", "Test", "Body", "other", gmail_message_id="held", deferred=True)
+    assert emails_processed_state(["done", "held", "new"]) == {"done": False, "held": True}
+    assert emails_processed_state([]) == {}
+
+
 def test_gmail_state():
     assert get_gmail_state() is None
 
@@ -97,6 +148,25 @@ def test_gmail_state():
     assert get_gmail_state() == "67890"
 
 
+def test_gmail_state_updated_at_stamped_by_db():
+    from datetime import datetime, timedelta
+
+    from sqlalchemy.dialects import postgresql
+
+    import db.email_history as eh
+    from db.models import GmailState, utcnow
+
+    set_gmail_state("1")
+    set_gmail_state("2")
+    session = eh.get_session()
+    try:
+        state = session.get(GmailState, 1)
+        assert abs(state.updated_at - datetime.utcnow()) < timedelta(minutes=1)
+    finally:
+        session.close()
+    assert str(utcnow().compile(dialect=postgresql.dialect())) == "TIMEZONE('utc', CURRENT_TIMESTAMP)"
+
+
 def test_save_and_get_with_thread_id():
     """Test saving and retrieving emails with gmail_thread_id."""
     thread_id = "thread_abc123"
@@ -305,3 +375,23 @@ def test_full_thread_history_passes_fetch_limit():
         gmail_account="default",
         max_results=45,
     )
+
+
+def test_merge_history_orders_naive_and_aware_keeps_latest():
+    """Naive local timestamps are treated as UTC when merged with Gmail ones."""
+    from datetime import datetime, timezone as tz
+
+    local = [
+        {"subject": "local-1", "created_at": datetime(2025, 6, 1, 10, 0), "gmail_message_id": "m1"},
+        {"subject": "local-2", "created_at": datetime(2025, 6, 1, 12, 0)},
+    ]
+    gmail = [
+        {"subject": "dup", "created_at": datetime(2025, 6, 1, 10, 0, tzinfo=tz.utc), "gmail_message_id": "m1"},
+        {"subject": "gmail-early", "created_at": datetime(2025, 6, 1, 9, 0, tzinfo=tz.utc)},
+        {"subject": "gmail-mid", "created_at": datetime(2025, 6, 1, 11, 0, tzinfo=tz.utc)},
+    ]
+
+    merged = _eh_module._merge_history(local, gmail, max_results=3)
+
+    assert [h["subject"] for h in merged] == ["local-1", "gmail-mid", "local-2"]
+    assert len(local) == 2  # input not mutated
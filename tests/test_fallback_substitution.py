@@ -47,7 +47,7 @@ def _install_stubs():
     # db stubs
     db_mod = types.ModuleType("db"); db_mod.__path__ = []
     db_memory = types.ModuleType("db.memory")
-    for fn in ("get_full_email_history", "save_email", "save_order_items",
+    for fn in ("get_full_email_history", "save_email", "save_emails_bulk", "save_order_items",
                "get_client", "decrement_discount", "calculate_order_price",
                "get_full_thread_history", "update_client", "replace_order_items"):
         setattr(db_memory, fn, lambda *a, **kw: None)
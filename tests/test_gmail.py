@@ -0,0 +1,312 @@
+"""Tests for tools.gmail.GmailClient.
+
+Uses a fake Gmail service — no network or credentials.
+
+Covers:
+- get_messages(): batched messages().get(), per-message errors, chunking,
+  parallel single gets when a batch call fails
+- search_thread_history(): batched fetch, failed messages skipped
+- _get_service(): OAuth credentials refreshed once per account per process;
+  Google client libs not imported until first use
+- fetch_thread(with_body=False): metadata format, no body
+- get_new_messages(): label filter and duplicate ids across history records
+- watch(): request body valid against the bundled discovery document
+- _pick_headers(): wanted headers only, first occurrence, case-insensitive
+- _extract_body(): text/plain preferred, HTML fallback for stubs, nested parts
+"""
+
+import base64
+import json
+import subprocess
+import sys
+from datetime import datetime, timezone
+from pathlib import Path
+from unittest.mock import MagicMock
+
+import pytest
+
+from tools import gmail
+from tools.gmail import GmailClient
+
+
+def _b64(text):
+    return base64.urlsafe_b64encode(text.encode()).decode()
+
+
+def _part(mime, text=None, parts=None):
+    part = {"mimeType": mime, "body": {"data": _b64(text)} if text is not None else {}}
+    if parts is not None:
+        part["parts"] = parts
+    return part
+
+
+def _raw(msg_id, sender="c@example.com", subject="Hello", body="Body text", date=None,
+         internal_ms="1774260000000"):
+    headers = [{"name": "From", "value": sender}, {"name": "Subject", "value": subject}]
+    if date:
+        headers.append({"name": "Date", "value": date})
+    return {
+        "id": msg_id,
+        "threadId": f"t_{msg_id}",
+        "internalDate": internal_ms,
+        "payload": {
+            "mimeType": "text/plain",
+            "headers": headers,
+            "body": {"data": base64.urlsafe_b64encode(body.encode()).decode()},
+        },
+    }
+
+
+class _FakeBatch:
+    def __init__(self, callback, responses, log, fail=False):
+        self._callback = callback
+        self._responses = responses
+        self._requests = []
+        self._fail = fail
+        log.append(self._requests)
+
+    def add(self, request, request_id):
+        self._requests.append(request_id)
+
+    def execute(self):
+        if self._fail:
+            raise ConnectionError("batch endpoint unavailable")
+        for request_id in self._requests:
+            response = self._responses[request_id]
+            if isinstance(response, Exception):
+                self._callback(request_id, None, response)
+            else:
+                self._callback(request_id, response, None)
+
+
+def _client(responses, search_ids=(), batch_fails=False):
+    batches = []
+    service = MagicMock()
+    service.new_batch_http_request.side_effect = (
+        lambda callback: _FakeBatch(callback, responses, batches, fail=batch_fails)
+    )
+    service.users().messages().list().execute.return_value = {
+        "messages": [{"id": m} for m in search_ids],
+    }
+    client = GmailClient()
+    client._service = service
+    return client, batches
+
+
+class TestGetMessages:
+
+    def test_one_batch_parsed_in_order(self):
+        client, batches = _client({"m1": _raw("m1", subject="First"), "m2": _raw("m2", subject="Second")})
+
+        messages = client.get_messages(["m2", "m1", "m2"])
+
+        assert batches == [["m2", "m1"]]
+        assert list(messages) == ["m2", "m1"]
+        assert messages["m1"]["subject"] == "First"
+        assert messages["m1"]["body"] == "Body text"
+        assert messages["m1"]["gmail_thread_id"] == "t_m1"
+
+    def test_failed_message_returned_as_exception(self):
+        error = RuntimeError("404")
+        client, _ = _client({"ok": _raw("ok"), "bad": error, "broken": {"id": "broken"}})
+
+        messages = client.get_messages(["ok", "bad", "broken"])
+
+        assert messages["ok"]["from"] == "c@example.com"
+        assert messages["bad"] is error
+        assert isinstance(messages["broken"], KeyError)
+
+    def test_chunked_by_batch_size(self):
+        ids = [f"m{i}" for i in range(gmail._BATCH_SIZE + 1)]
+        client, batches = _client({m: _raw(m) for m in ids})
+
+        assert len(client.get_messages(ids)) == len(ids)
+        assert [len(b) for b in batches] == [gmail._BATCH_SIZE, 1]
+
+    def test_failed_batch_falls_back_to_single_gets(self):
+        responses = {"m1": _raw("m1", subject="First"), "m2": RuntimeError("404")}
+        client, batches = _client(responses, batch_fails=True)
+
+        def _get(userId, id, format):
+            def _execute(http):
+                assert http is not None  # own connection per thread
+                if isinstance(responses[id], Exception):
+                    raise responses[id]
+                return responses[id]
+            return MagicMock(execute=_execute)
+
+        client._service.users().messages().get.side_effect = _get
+
+        messages = client.get_messages(["m1", "m2"])
+
+        assert batches == [["m1", "m2"]]
+        assert messages["m1"]["subject"] == "First"
+        assert messages["m2"] is responses["m2"]
+
+
+class TestFetchThread:
+
+    def test_metadata_only_without_body(self):
+        inbound = _raw("in1")
+        outbound = _raw("out1", sender="me@shop.com")
+        outbound["labelIds"] = ["SENT"]
+        outbound["internalDate"] = "1774263600000"
+        outbound["payload"]["headers"].append({"name": "To", "value": "Client <c@example.com>"})
+        for msg in (inbound, outbound):
+            del msg["payload"]["body"]  # format=metadata has headers only
+        client, _ = _client({})
+        threads = client._service.users().threads()
+        threads.get.return_value.execute.return_value = {"messages": [outbound, inbound]}
+
+        messages = client.fetch_thread("t1", with_body=False)
+
+        assert threads.get.call_args.kwargs["format"] == "metadata"
+        assert [(m["gmail_message_id"], m["direction"], m["body"]) for m in messages] == [
+            ("in1", "inbound", ""), ("out1", "outbound", ""),
+        ]
+        assert messages[1]["client_email"] == "c@example.com"
+
+
+class TestGetNewMessages:
+
+    def test_filters_labels_and_keeps_first_occurrence(self):
+        def _added(msg_id, *labels):
+            return {"message": {"id": msg_id, "threadId": f"t_{msg_id}", "labelIds": list(labels)}}
+
+        pages = [
+            {"historyId": "20", "nextPageToken": "p2", "history": [
+                {"messagesAdded": [_added("m1", "INBOX"), _added("promo", "INBOX", "CATEGORY_PROMOTIONS")]},
+                {"messagesAdded": [_added("sent", "INBOX", "SENT"), _added("m2", "INBOX", "UNREAD")]},
+            ]},
+            {"historyId": "21", "history": [
+                {"messagesAdded": [_added("m1", "INBOX"), _added("archived"), _added("m3", "INBOX")]},
+            ]},
+        ]
+        client, _ = _client({})
+        client._service.users().history().list().execute.side_effect = pages
+
+        messages = client.get_new_messages(after_history_id="10")
+
+        assert messages == [
+            {"msg_id": "m1", "history_id": "20", "thread_id": "t_m1"},
+            {"msg_id": "m2", "history_id": "20", "thread_id": "t_m2"},
+            {"msg_id": "m3", "history_id": "21", "thread_id": "t_m3"},
+        ]
+
+
+class TestWatch:
+
+    def test_request_body(self):
+        client, _ = _client({})
+        users = client._service.users()
+        users.watch().execute.return_value = {"historyId": "5", "expiration": "123"}
+
+        assert client.watch("projects/p/topics/gmail") == {"historyId": "5", "expiration": "123"}
+
+        body = users.watch.call_args.kwargs["body"]
+        assert users.watch.call_args.kwargs["userId"] == "me"
+        assert body == {"topicName": "projects/p/topics/gmail", "labelIds": ["INBOX"], "labelFilterBehavior": "include"}
+        # Enum values are case-sensitive; Gmail rejects anything else with a 400
+        import googleapiclient
+        doc = Path(googleapiclient.__file__).parent / "discovery_cache" / "documents" / "gmail.v1.json"
+        schema = json.loads(doc.read_text())["schemas"]["WatchRequest"]["properties"]
+        assert set(body) <= set(schema)
+        assert body["labelFilterBehavior"] in schema["labelFilterBehavior"]["enum"]
+
+
+class TestSearchThreadHistory:
+
+    def test_batched_and_sorted_oldest_first(self):
+        # internalDate orders the result; the sender's Date header is not used
+        responses = {
+            "new": _raw("new", subject="Newer", date="Mon, 23 Mar 2026 10:00:00 +0000",
+                        internal_ms="1774346400000"),
+            "old": _raw("old", sender="me@shop.com", subject="Older", date="Tue, 24 Mar 2026 10:00:00 +0000",
+                        internal_ms="1774260000000"),
+            "bad": RuntimeError("500"),
+        }
+        client, batches = _client(responses, search_ids=["new", "bad", "old"])
+
+        history = client.search_thread_history("C@example.com")
+
+        assert batches == [["new", "bad", "old"]]
+        assert [m["subject"] for m in history] == ["Older", "Newer"]
+        assert [m["direction"] for m in history] == ["outbound", "inbound"]
+        assert history[0]["created_at"] == datetime(2026, 3, 23, 10, 0, tzinfo=timezone.utc)
+
+
+class TestGetService:
+
+    def test_credentials_shared_across_clients(self, monkeypatch):
+        monkeypatch.setenv("GMAIL_CLIENT_ID", "id")
+        monkeypatch.setenv("GMAIL_CLIENT_SECRET", "secret")
+        monkeypatch.setenv("GMAIL_REFRESH_TOKEN", "refresh")
+        monkeypatch.setattr(gmail, "_credentials", {})
+        creds_cls = MagicMock()
+        build = MagicMock()
+        monkeypatch.setattr("google.oauth2.credentials.Credentials", creds_cls)
+        monkeypatch.setattr("googleapiclient.discovery.build", build)
+
+        GmailClient()._get_service()
+        GmailClient()._get_service()
+
+        creds_cls.assert_called_once()
+        creds_cls.return_value.refresh.assert_called_once()
+        assert build.call_count == 2
+        assert build.call_args.kwargs["static_discovery"] is True
+        assert build.call_args.kwargs["http"].http.timeout == gmail._HTTP_TIMEOUT
+
+    def test_module_import_skips_google_libs(self):
+        code = "import sys, tools.gmail; print(any(m.startswith('googleapiclient') for m in sys.modules))"
+        out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True,
+                             cwd=Path(gmail.__file__).parents[1], check=True)
+        assert out.stdout.strip() == "False"
+
+
+class TestExtractBody:
+
+    PLAIN = "Hello, I would like to order two boxes."
+
+    def test_plain_preferred_over_html(self, monkeypatch):
+        monkeypatch.setattr(GmailClient, "_html_to_text", staticmethod(lambda html: pytest.fail("HTML parsed")))
+        payload = _part("multipart/alternative", parts=[
+            _part("text/html", "<p>Hello</p>"),
+            _part("text/plain", self.PLAIN),
+        ])
+        assert GmailClient()._extract_body(payload) == self.PLAIN
+
+    def test_stub_plain_falls_back_to_html(self):
+        payload = _part("multipart/mixed", parts=[
+            _part("multipart/alternative", parts=[
+                _part("text/plain", "Your client does not support HTML"),
+                _part("text/html", "<p>Order <b>123</b></p>"),
+            ]),
+            _part("image/png", "png"),
+        ])
+        assert GmailClient()._extract_body(payload) == "Order 123"
+
+    def test_first_plain_part_wins(self):
+        payload = _part("multipart/mixed", parts=[
+            _part("text/plain", "short"),
+            _part("text/plain", self.PLAIN),
+        ])
+        assert GmailClient()._extract_body(payload) == "short"
+
+    def test_single_part_and_empty(self):
+        assert GmailClient()._extract_body(_part("text/plain", self.PLAIN)) == self.PLAIN
+        assert GmailClient()._extract_body(_part("multipart/mixed", parts=[_part("text/plain", "ok")])) == "ok"
+        assert GmailClient()._extract_body(_part("text/html", "<p>Hi</p>")) == "Hi"
+        assert GmailClient()._extract_body(_part("multipart/mixed", parts=[_part("text/plain")])) == ""
+
+
+def test_pick_headers_first_occurrence_only_wanted():
+    payload = {"headers": [
+        {"name": "Received", "value": "x"},
+        {"name": "SUBJECT", "value": "First"},
+        {"name": "From", "value": "a@example.com"},
+        {"name": "Subject", "value": "Second"},
+    ]}
+    assert GmailClient._pick_headers(payload, frozenset(("from", "subject", "date"))) == {
+        "subject": "First", "from": "a@example.com",
+    }
+    assert GmailClient._pick_headers({}, frozenset(("from",))) == {}
@@ -72,6 +72,7 @@ def _install_stubs():
     db_memory = sys.modules["db.memory"]
     db_memory.decrement_discount = MagicMock()
     db_memory.save_email = MagicMock()
+    db_memory.save_emails_bulk = MagicMock()
     db_memory.get_full_thread_history = MagicMock(return_value=[])
     db_memory.get_full_email_history = MagicMock(return_value=[])
     db_memory.get_client = MagicMock(return_value=None)
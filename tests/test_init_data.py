@@ -0,0 +1,19 @@
+"""Tests for db.init_data.init_default_data()."""
+
+from sqlalchemy import create_engine, inspect
+
+from db.init_data import init_default_data
+from db.models import Base
+
+
+def test_creates_only_missing_tables():
+    engine = create_engine("sqlite:///:memory:")
+    Base.metadata.tables["clients"].create(engine)
+
+    init_default_data(bind=engine)
+    assert set(inspect(engine).get_table_names()) == set(Base.metadata.tables)
+
+    # Second start: nothing missing, no DDL
+    init_default_data(bind=engine)
+    assert set(inspect(engine).get_table_names()) == set(Base.metadata.tables)
+    engine.dispose()
@@ -0,0 +1,43 @@
+"""Tests for the email_history composite index migration.
+
+Uses SQLite in-memory DB via the shared db_session fixture.
+"""
+
+from sqlalchemy import text
+
+from scripts.migrate_email_history_indexes import INDEXES, run_migration
+
+
+def _drop_indexes(engine):
+    with engine.connect() as conn:
+        for name in INDEXES:
+            conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
+        conn.commit()
+
+
+class TestMigrateEmailHistoryIndexes:
+
+    def test_model_declares_indexes(self, db_session):
+        """Fresh databases get the indexes from create_all."""
+        engine = db_session().get_bind()
+        report = run_migration(bind=engine)
+        assert set(report["indexes"].values()) == {"already_exists"}
+
+    def test_creates_missing_indexes(self, db_session):
+        engine = db_session().get_bind()
+        _drop_indexes(engine)
+
+        report = run_migration(bind=engine)
+        assert report["indexes"] == {name: "created" for name in INDEXES}
+
+        rerun = run_migration(bind=engine)
+        assert set(rerun["indexes"].values()) == {"already_exists"}
+
+    def test_rollback_drops_indexes(self, db_session):
+        engine = db_session().get_bind()
+
+        report = run_migration(rollback=True, bind=engine)
+        assert report["indexes"] == {name: "dropped" for name in INDEXES}
+
+        again = run_migration(rollback=True, bind=engine)
+        assert set(again["indexes"].values()) == {"noop"}
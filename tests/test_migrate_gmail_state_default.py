@@ -0,0 +1,12 @@
+"""Tests for the gmail_state.updated_at default migration.
+
+Uses SQLite in-memory DB via the shared db_session fixture.
+"""
+
+from scripts.migrate_gmail_state_default import run_migration
+
+
+def test_sqlite_skipped(db_session):
+    """SQLite can't alter column defaults; create_all already declares it."""
+    assert run_migration(bind=db_session().get_bind()) == "unsupported"
+
@@ -87,6 +87,7 @@ def _install_stubs() -> None:
         db_memory.get_full_email_history = lambda *a, **kw: []
         db_memory.get_full_thread_history = lambda *a, **kw: []
         db_memory.save_email = lambda *a, **kw: None
+        db_memory.save_emails_bulk = lambda *a, **kw: None
         db_memory.save_order_items = lambda *a, **kw: None
         db_memory.update_client = lambda *a, **kw: None
         sys.modules["db.memory"] = db_memory
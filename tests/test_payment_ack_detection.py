@@ -608,7 +608,7 @@ class TestPersistResultsStateTransitions:
         classification = self._make_classification()
         result = self._make_result()
 
-        with _patch("agents.pipeline.save_email"), \
+        with _patch("agents.pipeline.save_emails_bulk"), \
              _patch("agents.pipeline.save_state") as mock_save, \
              _patch("agents.pipeline.save_order_items", return_value=None), \
              _patch("agents.pipeline.update_client"):
@@ -628,7 +628,7 @@ class TestPersistResultsStateTransitions:
         classification = self._make_classification()
         result = self._make_result(payment_type="postpay")
 
-        with _patch("agents.pipeline.save_email"), \
+        with _patch("agents.pipeline.save_emails_bulk"), \
              _patch("agents.pipeline.save_state"), \
              _patch("agents.pipeline.save_order_items", return_value=None), \
              _patch("agents.pipeline.update_client"):
@@ -647,7 +647,7 @@ class TestPersistResultsStateTransitions:
             "stock_check": {"items": [], "insufficient_items": []},
         })
 
-        with _patch("agents.pipeline.save_email"), \
+        with _patch("agents.pipeline.save_emails_bulk"), \
              _patch("agents.pipeline.save_state"), \
              _patch("agents.pipeline.save_order_items", return_value=None), \
              _patch("agents.pipeline.update_client"):
@@ -667,7 +667,7 @@ class TestPersistResultsStateTransitions:
         )
         result["conversation_state"]["status"] = "awaiting_payment"
 
-        with _patch("agents.pipeline.save_email"), \
+        with _patch("agents.pipeline.save_emails_bulk"), \
              _patch("agents.pipeline.save_state"), \
              _patch("agents.pipeline.save_order_items", return_value=None), \
              _patch("agents.pipeline.update_client"):
@@ -689,7 +689,7 @@ class TestPersistResultsStateTransitions:
         )
         result["conversation_state"]["status"] = "awaiting_payment"
 
-        with _patch("agents.pipeline.save_email"), \
+        with _patch("agents.pipeline.save_emails_bulk"), \
              _patch("agents.pipeline.save_state"), \
              _patch("agents.pipeline.save_order_items", return_value=None), \
              _patch("agents.pipeline.update_client"):
@@ -130,6 +130,7 @@ def _install_stubs():
 
     db_memory = sys.modules["db.memory"]
     db_memory.save_email = MagicMock()
+    db_memory.save_emails_bulk = MagicMock()
     db_memory.save_order_items = MagicMock()
     db_memory.get_client = lambda *a, **kw: None
     db_memory.get_stock_summary = lambda *a, **kw: ""
@@ -186,7 +187,8 @@ _ATTR_LIST = [
     ("db.region_preference", "apply_region_preference"), ("db.region_preference", "apply_thread_hint"),
     ("db.stock", "extract_variant_id"), ("db.stock", "has_ambiguous_variants"),
     ("db.email_history", "get_full_thread_history"),
-    ("db.memory", "save_email"), ("db.memory", "save_order_items"),
+    ("db.memory", "save_email"), ("db.memory", "save_emails_bulk"),
+    ("db.memory", "save_order_items"),
     ("db.memory", "get_client"), ("db.memory", "get_stock_summary"),
     ("db.memory", "calculate_order_price"), ("db.memory", "check_stock_for_order"),
     ("db.memory", "resolve_order_items"), ("db.memory", "replace_order_items"),
@@ -375,7 +377,7 @@ class TestPersistResultsWritesPendingOOS(unittest.TestCase):
 
         from agents import pipeline
 
-        with patch.object(pipeline, "save_email"), \
+        with patch.object(pipeline, "save_emails_bulk"), \
              patch.object(pipeline, "save_state") as mock_save, \
              patch.object(pipeline, "save_order_items", MagicMock()):
             pipeline._persist_results(
@@ -410,7 +412,7 @@ class TestPersistResultsWritesPendingOOS(unittest.TestCase):
 
         from agents import pipeline
 
-        with patch.object(pipeline, "save_email"), \
+        with patch.object(pipeline, "save_emails_bulk"), \
              patch.object(pipeline, "save_state"), \
              patch.object(pipeline, "save_order_items", MagicMock()):
             pipeline._persist_results(
@@ -435,7 +437,7 @@ class TestPersistResultsWritesPendingOOS(unittest.TestCase):
 
         from agents import pipeline
 
-        with patch.object(pipeline, "save_email"), \
+        with patch.object(pipeline, "save_emails_bulk"), \
              patch.object(pipeline, "save_state"), \
              patch.object(pipeline, "save_order_items", MagicMock()):
             pipeline._persist_results(
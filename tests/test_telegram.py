@@ -0,0 +1,74 @@
+"""Tests for utils.telegram.send_telegram() and its send worker.
+
+Uses httpx.MockTransport on the shared client — no network. The module is
+loaded from its file: several suites replace utils.telegram in sys.modules
+or patch send_telegram on it.
+"""
+
+import importlib.util
+import json
+import queue
+from pathlib import Path
+
+import httpx
+
+_spec = importlib.util.spec_from_file_location(
+    "_telegram_under_test", Path(__file__).resolve().parent.parent / "utils" / "telegram.py",
+)
+telegram = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(telegram)
+
+
+def _mock_client(monkeypatch, *statuses):
+    """Shared client answering with statuses in turn (last one repeats)."""
+    sent = []
+
+    def _handler(request):
+        sent.append(json.loads(request.content))
+        return httpx.Response(statuses[min(len(sent), len(statuses)) - 1], text="{}")
+
+    monkeypatch.setattr(telegram, "TELEGRAM_BOT_TOKEN", "token")
+    monkeypatch.setattr(telegram, "TELEGRAM_CHAT_ID", "42")
+    monkeypatch.setattr(telegram, "_RETRY_DELAYS", (0, 0))
+    monkeypatch.setattr(telegram, "_client", httpx.Client(transport=httpx.MockTransport(_handler)))
+    return sent
+
+
+def test_sends_queued_in_order(monkeypatch):
+    sent = _mock_client(monkeypatch, 200)
+
+    assert telegram.send_telegram("one") is True
+    assert telegram.send_telegram("two", parse_mode="Markdown") is True
+    assert telegram.flush(timeout=5)
+    assert sent == [
+        {"chat_id": "42", "text": "one", "parse_mode": "HTML"},
+        {"chat_id": "42", "text": "two", "parse_mode": "Markdown"},
+    ]
+
+
+def test_server_error_retried(monkeypatch):
+    sent = _mock_client(monkeypatch, 502, 429, 200)
+    assert telegram._post("x", "HTML") is True
+    assert len(sent) == 3
+
+
+def test_api_error_not_retried(monkeypatch):
+    sent = _mock_client(monkeypatch, 400)
+    assert telegram._post("bad", "HTML") is False
+    assert len(sent) == 1
+
+
+def test_full_queue_drops_oldest(monkeypatch):
+    _mock_client(monkeypatch, 200)
+    monkeypatch.setattr(telegram, "_ensure_worker", lambda: None)
+    monkeypatch.setattr(telegram, "_queue", queue.Queue(maxsize=2))
+
+    for text in ("a", "b", "c"):
+        assert telegram.send_telegram(text) is True
+
+    assert [telegram._queue.get_nowait()[0] for _ in range(2)] == ["b", "c"]
+
+
+def test_not_configured(monkeypatch):
+    monkeypatch.setattr(telegram, "TELEGRAM_BOT_TOKEN", "")
+    assert telegram.send_telegram("x") is False
@@ -0,0 +1,117 @@
+"""Tests for small text helpers on the pipeline hot path.
+
+Covers:
+- classifier._parse_llm_json(): markdown fence stripping
+- classifier._normalize(): LLM field-name aliases and nesting priority
+- pipeline._extract_subject(): first Subject header line, header window only
+- template_utils._fill_placeholders(): pre-split template, {NAME} substitution
+- template_utils price helpers: integer-cent parsing and discount rounding
+"""
+
+import pytest
+
+from agents.classifier import _normalize, _parse_llm_json
+from agents.handlers.template_utils import (
+    _apply_discount_cents,
+    _fill_placeholders,
+    _format_cents,
+    _parse_price_cents,
+    _parse_template,
+)
+from agents.pipeline import _extract_subject
+
+
+@pytest.mark.parametrize("raw", [
+    '{"situation": "other"}',
+    '```json\n{"situation": "other"}\n```',
+    '```\n{"situation": "other"}\n```',
+    '  ```json {"situation": "other"} ```  ',
+])
+def test_parse_llm_json_strips_fences(raw):
+    assert _parse_llm_json(raw) == {"situation": "other"}
+
+
+def test_parse_llm_json_array():
+    assert _parse_llm_json('```json\n[{"a": 1}, {"a": 2}]\n```') == [{"a": 1}, {"a": 2}]
+
+
+@pytest.mark.parametrize("email_text, expected", [
+    ("From: a@example.com\nSubject: Order 123\nBody: hi", "Order 123"),
+    ("From: a@example.com\nSUBJECT:   Re: Hello  \r\nBody: hi", "Re: Hello"),
+    ("From: a@example.com\nBody: hi", ""),
+    ("Subject:\nBody: subject: not this", ""),
+    ("From: a@example.com\nSubject: first\nSubject: second", "first"),
+    ("Body: the subject: is inline, not a header", ""),
+])
+def test_extract_subject(email_text, expected):
+    assert _extract_subject(email_text) == expected
+
+
+def test_normalize_canonical_and_aliases():
+    data = {"category": "tracking", "customer_email": "a@example.com", "order_number": "123", "extra": 1}
+    assert _normalize(data) == {"situation": "tracking", "client_email": "a@example.com", "order_id": "123"}
+
+
+def test_normalize_earlier_name_wins_regardless_of_key_order():
+    data = {"email": "late@example.com", "name": "Nick", "client_email": "first@example.com"}
+    assert _normalize(data) == {"client_email": "first@example.com", "client_name": "Nick"}
+
+
+def test_normalize_none_is_missing():
+    data = {"price": None, "total": "$100", "needs_reply": None}
+    assert _normalize(data) == {"price": "$100"}
+
+
+def test_normalize_top_level_beats_nested():
+    data = {"customer": {"client_email": "nested@example.com", "name": "Nested"}, "email": "top@example.com"}
+    assert _normalize(data) == {"client_email": "top@example.com", "client_name": "Nested"}
+
+
+def test_normalize_first_nested_dict_wins():
+    data = {"a": {"street": "1 Main St"}, "b": {"customer_street": "2 Oak Ave", "city_state_zip": "NY"}}
+    assert _normalize(data) == {"customer_street": "1 Main St", "customer_city_state_zip": "NY"}
+
+
+def test_normalize_keeps_false_needs_reply():
+    assert _normalize({"needs_reply": False}) == {"needs_reply": False}
+
+
+def test_extract_subject_ignores_body_past_header_window():
+    email_text = "From: a@example.com\nBody: " + "x" * 5000 + "\nSubject: quoted"
+    assert _extract_subject(email_text) == ""
+
+
+def test_fill_placeholders_single_pass():
+    template = "Total {PRICE} - {DISCOUNT}% = {FINAL_PRICE}, {DISCOUNT_ORDERS_LEFT} left. {RECHECK_DATE}"
+    values = {"PRICE": "${FINAL_PRICE}", "DISCOUNT": "10", "FINAL_PRICE": "$90", "DISCOUNT_ORDERS_LEFT": "2"}
+    # Substituted values are not rescanned; unknown placeholders stay
+    assert _fill_placeholders(template, values) == "Total ${FINAL_PRICE} - 10% = $90, 2 left. {RECHECK_DATE}"
+
+
+def test_parse_template_cached_parts_and_names():
+    parts, names = _parse_template("Hi {CUSTOMER_NAME}, total {PRICE}{PRICE}!")
+    assert parts == ("Hi ", "CUSTOMER_NAME", ", total ", "PRICE", "", "PRICE", "!")
+    assert names == {"CUSTOMER_NAME", "PRICE"}
+    assert _parse_template("Hi {CUSTOMER_NAME}, total {PRICE}{PRICE}!")[0] is parts
+
+
+@pytest.mark.parametrize("price, cents", [
+    ("$1,234.50", 123450),
+    ("$0.29", 29),
+    ("220", 22000),
+    ("", 0),
+    ("TBD", 0),
+    (None, 0),
+])
+def test_parse_price_cents(price, cents):
+    assert _parse_price_cents(price) == cents
+
+
+@pytest.mark.parametrize("cents, discount, expected", [
+    (22000, 10, "$198.00"),
+    (1010, 15, "$8.59"),    # 8.585 rounds half-up
+    (10550, 15, "$89.68"),  # 89.675 rounds half-up
+    (5, 50, "$0.03"),
+])
+def test_discounted_price(cents, discount, expected):
+    assert _format_cents(_apply_discount_cents(cents, discount)) == expected
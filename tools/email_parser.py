@@ -34,6 +34,17 @@ _ITEM_RE = re.compile(
     re.MULTILINE,
 )
 
+# Website order notification fields (searched in the unquoted body)
+_ORDER_ID_RE = re.compile(r"Order ID:\s*(\d+)")
+_PAYMENT_MARKER_RE = re.compile(r"Payment amount:")
+_PAYMENT_AMOUNT_RE = re.compile(r"Payment amount:\s*\$?([\d,.]+)")
+_BODY_EMAIL_RE = re.compile(r"(?:^|\n)\s*Email:\s*(.+)")
+_FIRSTNAME_RE = re.compile(r"Firstname:\s*(.+?)(?:\n|$)")
+_STREET_RE = re.compile(r"Street address1?:\s*(.+?)(?:\n|$)")
+_TOWN_RE = re.compile(r"Town/City:\s*(.+?)(?:\n|$)")
+_STATE_RE = re.compile(r"State:\s*(.+?)(?:\n|$)")
+_ZIP_RE = re.compile(r"Postcode/Zip:\s*(.+?)(?:\n|$)")
+
 # Brand prefixes to strip from product names for base_flavor
 BRAND_PREFIXES = ("Tera ", "Terea ", "Heets ")
 
@@ -165,8 +176,8 @@ def _has_order_header(email_text: str) -> bool:
     Only checks the From: header — NOT Subject. Customer replies with
     'Re: Shipmecarton - Order ...' in Subject must NOT trigger the parser.
     """
-    # Extract From: line from headers
-    for line in email_text.split("\n"):
+    # Extract From: line from headers (they fit in the first 2 KB)
+    for line in email_text[:2048].split("\n"):
         if line.startswith("From:"):
             return "shipmecarton" in line.lower()
         if line.startswith("Body:"):
@@ -179,10 +190,7 @@ def _is_order_notification(body: str) -> bool:
 
     Both Order ID and Payment amount must be present in unquoted text.
     """
-    return bool(
-        re.search(r"Order ID:\s*\d+", body)
-        and re.search(r"Payment amount:", body)
-    )
+    return bool(_ORDER_ID_RE.search(body) and _PAYMENT_MARKER_RE.search(body))
 
 
 # ---------------------------------------------------------------------------
@@ -219,18 +227,18 @@ def try_parse_order(email_text: str) -> EmailClassification | None:
     # --- Parse fields from the full unquoted body ---
 
     # Order ID
-    m = re.search(r"Order ID:\s*(\d+)", unquoted_body)
+    m = _ORDER_ID_RE.search(unquoted_body)
     if not m:
         return None
     order_id = m.group(1)
 
     # Payment amount
-    m = re.search(r"Payment amount:\s*\$?([\d,.]+)", unquoted_body)
+    m = _PAYMENT_AMOUNT_RE.search(unquoted_body)
     price = f"${m.group(1)}" if m else None
 
     # Customer email (from "Email:" field in body)
     client_email = None
-    m = re.search(r"(?:^|\n)\s*Email:\s*(.+)", unquoted_body)
+    m = _BODY_EMAIL_RE.search(unquoted_body)
     if m:
         email_match = _EMAIL_RE.search(m.group(1))
         if email_match:
@@ -252,17 +260,17 @@ def try_parse_order(email_text: str) -> EmailClassification | None:
         return None
 
     # Customer name
-    m = re.search(r"Firstname:\s*(.+?)(?:\n|$)", unquoted_body)
+    m = _FIRSTNAME_RE.search(unquoted_body)
     client_name = m.group(1).strip() if m else None
 
     # Street address
-    m = re.search(r"Street address1?:\s*(.+?)(?:\n|$)", unquoted_body)
+    m = _STREET_RE.search(unquoted_body)
     customer_street = m.group(1).strip() if m else None
 
     # City, State, Zip (3 separate fields)
-    town_m = re.search(r"Town/City:\s*(.+?)(?:\n|$)", unquoted_body)
-    state_m = re.search(r"State:\s*(.+?)(?:\n|$)", unquoted_body)
-    zip_m = re.search(r"Postcode/Zip:\s*(.+?)(?:\n|$)", unquoted_body)
+    town_m = _TOWN_RE.search(unquoted_body)
+    state_m = _STATE_RE.search(unquoted_body)
+    zip_m = _ZIP_RE.search(unquoted_body)
 
     city_state_zip = None
     if town_m:
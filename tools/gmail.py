@@ -13,14 +13,22 @@ Usage:
 
 import base64
 import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
 from email.mime.text import MIMEText
 from email.utils import parseaddr
 from os import getenv
+from typing import TYPE_CHECKING
 
-from google.auth.transport.requests import Request
-from google.oauth2.credentials import Credentials
-from googleapiclient.discovery import build
+try:
+    import pybase64 as _b64  # SIMD base64 decoder, same API as the stdlib module
+except ImportError:
+    _b64 = base64
+
+if TYPE_CHECKING:
+    from google.oauth2.credentials import Credentials
+    from google_auth_httplib2 import AuthorizedHttp
 
 logger = logging.getLogger(__name__)
 
@@ -30,14 +38,35 @@ SCOPES = [
 ]
 
 # Gmail category labels to skip (only process PRIMARY inbox)
-_SKIP_LABELS = {
+_SKIP_LABELS = frozenset({
     "CATEGORY_PROMOTIONS",
     "CATEGORY_SOCIAL",
     "CATEGORY_UPDATES",
     "CATEGORY_FORUMS",
     "SPAM",
     "TRASH",
-}
+})
+
+# Gmail advises at most 50 calls per batch request; larger batches are
+# rate-limited as a whole
+_BATCH_SIZE = 50
+# Socket timeout for Gmail API calls (a 50-message format=full batch is the slowest)
+_HTTP_TIMEOUT = 30
+# Parallel single gets when a whole batch call fails (Gmail allows ~250 QPS/user)
+_FALLBACK_WORKERS = 8
+
+# OAuth credentials per refresh token, shared by every GmailClient in the
+# process (db.email_history builds a new client per history lookup). An
+# expired access token is refreshed by google-auth on the next request.
+_credentials: dict[str, "Credentials"] = {}
+_credentials_lock = threading.Lock()
+
+# Lower-cased headers each parser reads (see GmailClient._pick_headers)
+_MESSAGE_HEADERS = frozenset(("from", "reply-to", "subject"))
+_THREAD_HEADERS = frozenset(("from", "to", "reply-to", "subject"))
+_HISTORY_HEADERS = frozenset(("from", "subject"))
+# The same for fetch_thread(format=metadata), which only returns these
+_THREAD_METADATA_HEADERS = ["From", "To", "Reply-To", "Subject"]
 
 # Named accounts: account_name → env var suffix for refresh token
 # "default" → GMAIL_REFRESH_TOKEN, "tilda" → GMAIL_REFRESH_TOKEN_TILDA
@@ -47,6 +76,16 @@ GMAIL_ACCOUNTS = {
 }
 
 
+def _authorized_http(creds) -> "AuthorizedHttp":
+    """One keep-alive httplib2 connection pool, authorized with creds."""
+    from google_auth_httplib2 import AuthorizedHttp
+    from googleapiclient.http import build_http
+
+    http = build_http()
+    http.timeout = _HTTP_TIMEOUT
+    return AuthorizedHttp(creds, http=http)
+
+
 class GmailClient:
     """Gmail API client using refresh_token from env.
 
@@ -57,6 +96,7 @@ class GmailClient:
 
     def __init__(self, account: str = "default"):
         self._service = None
+        self._creds = None
         self._account = account
 
     @property
@@ -80,16 +120,31 @@ class GmailClient:
                 f"GMAIL_REFRESH_TOKEN{suffix} in .env"
             )
 
-        creds = Credentials(
-            token=None,
-            refresh_token=refresh_token,
-            token_uri="https://oauth2.googleapis.com/token",
-            client_id=client_id,
-            client_secret=client_secret,
+        # Google client libs are imported on first use: the poller and admin
+        # tools import this module even when Gmail is not configured, and
+        # googleapiclient.discovery alone costs ~0.3s of startup.
+        from google.auth.transport.requests import Request
+        from google.oauth2.credentials import Credentials
+        from googleapiclient.discovery import build
+
+        with _credentials_lock:
+            creds = _credentials.get(refresh_token)
+            if creds is None:
+                creds = Credentials(
+                    token=None,
+                    refresh_token=refresh_token,
+                    token_uri="https://oauth2.googleapis.com/token",
+                    client_id=client_id,
+                    client_secret=client_secret,
+                )
+                creds.refresh(Request())
+                _credentials[refresh_token] = creds
+
+        self._creds = creds
+        # Discovery document bundled with google-api-python-client — no HTTP fetch
+        self._service = build(
+            "gmail", "v1", http=_authorized_http(creds), static_discovery=True, cache_discovery=False,
         )
-        creds.refresh(Request())
-
-        self._service = build("gmail", "v1", credentials=creds)
         return self._service
 
     def get_current_history_id(self) -> str:
@@ -98,6 +153,21 @@ class GmailClient:
         profile = service.users().getProfile(userId="me").execute()
         return profile["historyId"]
 
+    def watch(self, topic_name: str) -> dict:
+        """Start (or renew) Gmail push notifications for INBOX changes.
+
+        Gmail publishes {emailAddress, historyId} to the Pub/Sub topic on
+        every change. A watch lasts 7 days and must be renewed before it
+        expires.
+
+        Returns {historyId, expiration} (expiration in epoch ms).
+        """
+        service = self._get_service()
+        return service.users().watch(
+            userId="me",
+            body={"topicName": topic_name, "labelIds": ["INBOX"], "labelFilterBehavior": "include"},
+        ).execute()
+
     def get_new_messages(self, after_history_id: str) -> list[dict]:
         """Fetch new inbox messages since the given history_id.
 
@@ -105,6 +175,8 @@ class GmailClient:
         """
         service = self._get_service()
         messages = []
+        # Same message can appear in multiple history records — keep the first
+        seen = set()
         page_token = None
 
         while True:
@@ -134,11 +206,15 @@ class GmailClient:
             for record in result.get("history", []):
                 for msg_added in record.get("messagesAdded", []):
                     msg = msg_added["message"]
-                    labels = set(msg.get("labelIds", []))
+                    msg_id = msg["id"]
+                    if msg_id in seen:
+                        continue
+                    labels = msg.get("labelIds", [])
                     # Only primary inbox (skip sent, promotions, social, etc.)
-                    if "INBOX" in labels and "SENT" not in labels and not labels & _SKIP_LABELS:
+                    if "INBOX" in labels and "SENT" not in labels and _SKIP_LABELS.isdisjoint(labels):
+                        seen.add(msg_id)
                         messages.append({
-                            "msg_id": msg["id"],
+                            "msg_id": msg_id,
                             "history_id": history_id,
                             "thread_id": msg.get("threadId"),
                         })
@@ -147,15 +223,7 @@ class GmailClient:
             if not page_token:
                 break
 
-        # Deduplicate by msg_id (same message can appear in multiple history records)
-        seen = set()
-        unique = []
-        for m in messages:
-            if m["msg_id"] not in seen:
-                seen.add(m["msg_id"])
-                unique.append(m)
-
-        return unique
+        return messages
 
     def list_unread_inbox(self, max_results: int = 10) -> list[dict]:
         """Fetch unread PRIMARY inbox messages (for initial catch-up).
@@ -183,8 +251,83 @@ class GmailClient:
         msg = service.users().messages().get(
             userId="me", id=msg_id, format="full"
         ).execute()
+        return self._parse_message(msg_id, msg)
+
+    def get_messages(self, msg_ids: list[str]) -> dict[str, dict | Exception]:
+        """Fetch and parse several Gmail messages with batched API calls.
+
+        Returns {msg_id: get_message() dict, or the exception for that message},
+        in msg_ids order. One failed message does not fail the others.
+        """
+        messages: dict[str, dict | Exception] = {}
+        for msg_id, raw in self._get_raw_messages(msg_ids).items():
+            if isinstance(raw, Exception):
+                messages[msg_id] = raw
+                continue
+            try:
+                messages[msg_id] = self._parse_message(msg_id, raw)
+            except Exception as e:
+                messages[msg_id] = e
+        return messages
+
+    def _get_raw_messages(self, msg_ids: list[str], fmt: str = "full") -> dict[str, dict | Exception]:
+        """messages().get() for many ids, _BATCH_SIZE calls per HTTP request.
+
+        Returns {msg_id: raw API response or exception}, in msg_ids order.
+        """
+        service = self._get_service()
+        msg_ids = list(dict.fromkeys(msg_ids))  # batch request_ids must be unique
+        results: dict[str, dict | Exception] = {}
+
+        def _on_msg(request_id, response, exception):
+            results[request_id] = exception if exception is not None else response
+
+        for start in range(0, len(msg_ids), _BATCH_SIZE):
+            chunk = msg_ids[start:start + _BATCH_SIZE]
+            batch = service.new_batch_http_request(callback=_on_msg)
+            for msg_id in chunk:
+                batch.add(
+                    service.users().messages().get(userId="me", id=msg_id, format=fmt),
+                    request_id=msg_id,
+                )
+            try:
+                batch.execute()
+            except Exception as e:
+                logger.warning(
+                    "Gmail batch request failed (%s), fetching %d messages individually", e, len(chunk),
+                )
+                results.update(self._get_raw_messages_parallel(
+                    [m for m in chunk if m not in results], fmt,
+                ))
+
+        return {msg_id: results[msg_id] for msg_id in msg_ids if msg_id in results}
+
+    def _get_raw_messages_parallel(self, msg_ids: list[str], fmt: str) -> dict[str, dict | Exception]:
+        """Fallback for a failed batch call: concurrent single messages().get().
+
+        httplib2 connections are not thread-safe, so each call runs on its own
+        authorized Http. Returns {msg_id: raw API response or exception}.
+        """
+        if not msg_ids:
+            return {}
+        service = self._get_service()
+        requests = [
+            service.users().messages().get(userId="me", id=msg_id, format=fmt)
+            for msg_id in msg_ids
+        ]
 
-        headers = {h["name"].lower(): h["value"] for h in msg["payload"]["headers"]}
+        def _execute(request):
+            try:
+                return request.execute(http=_authorized_http(self._creds))
+            except Exception as e:
+                return e
+
+        with ThreadPoolExecutor(max_workers=min(_FALLBACK_WORKERS, len(requests))) as pool:
+            return dict(zip(msg_ids, pool.map(_execute, requests)))
+
+    def _parse_message(self, msg_id: str, msg: dict) -> dict:
+        """Build the get_message() dict from a raw format=full message."""
+        headers = self._pick_headers(msg["payload"], _MESSAGE_HEADERS)
 
         from_raw = headers.get("from", "")
         _, from_email = parseaddr(from_raw)
@@ -195,14 +338,7 @@ class GmailClient:
 
         body = self._extract_body(msg["payload"])
 
-        # Prefer Gmail internalDate (epoch ms, UTC); fallback to now UTC.
-        created_at = datetime.now(timezone.utc)
-        internal_ms = msg.get("internalDate")
-        if internal_ms:
-            try:
-                created_at = datetime.fromtimestamp(int(internal_ms) / 1000, tz=timezone.utc)
-            except Exception:
-                pass
+        created_at = self._internal_date(msg)
 
         return {
             "from": from_email or from_raw,
@@ -216,7 +352,9 @@ class GmailClient:
             "created_at": created_at,
         }
 
-    def fetch_thread(self, thread_id: str, max_messages: int | None = None) -> list[dict]:
+    def fetch_thread(
+        self, thread_id: str, max_messages: int | None = None, with_body: bool = True,
+    ) -> list[dict]:
         """Fetch messages in a Gmail thread by threadId.
 
         Uses threads().get() — single API call for entire thread.
@@ -225,11 +363,19 @@ class GmailClient:
         Direction is determined by Gmail SENT label (works for all accounts
         including tilda/iqostilda2). Timestamp uses internalDate (same as
         get_message) for deterministic cross-method comparison.
+
+        with_body=False fetches format=metadata (headers, labels, internalDate
+        only) and returns body "" — for callers that only compare direction
+        and timestamps.
         """
         service = self._get_service()
+        if with_body:
+            params = {"format": "full"}
+        else:
+            params = {"format": "metadata", "metadataHeaders": _THREAD_METADATA_HEADERS}
         try:
             thread = service.users().threads().get(
-                userId="me", id=thread_id, format="full",
+                userId="me", id=thread_id, **params,
             ).execute()
         except Exception as e:
             logger.error("Failed to fetch thread %s: %s", thread_id, e)
@@ -241,7 +387,7 @@ class GmailClient:
 
         messages = []
         for msg in raw_messages:
-            headers = {h["name"].lower(): h["value"] for h in msg["payload"]["headers"]}
+            headers = self._pick_headers(msg["payload"], _THREAD_HEADERS)
             label_ids = msg.get("labelIds", [])
 
             from_raw = headers.get("from", "")
@@ -252,15 +398,7 @@ class GmailClient:
             direction = "outbound" if is_outbound else "inbound"
 
             # Timestamp: use internalDate (epoch ms, same as get_message)
-            created_at = datetime.now(timezone.utc)
-            internal_ms = msg.get("internalDate")
-            if internal_ms:
-                try:
-                    created_at = datetime.fromtimestamp(
-                        int(internal_ms) / 1000, tz=timezone.utc,
-                    )
-                except Exception:
-                    pass
+            created_at = self._internal_date(msg)
 
             # Determine client email (the non-us address)
             reply_to = headers.get("reply-to", "")
@@ -277,7 +415,7 @@ class GmailClient:
                 "client_email": client_email,
                 "direction": direction,
                 "subject": headers.get("subject", ""),
-                "body": self._extract_body(msg["payload"]),
+                "body": self._extract_body(msg["payload"]) if with_body else "",
                 "situation": "unknown",
                 "created_at": created_at,
                 "gmail_message_id": msg.get("id", ""),
@@ -305,7 +443,7 @@ class GmailClient:
         of manual replies the operator sent outside the automation.
         Direction detected via SENT label (works for all accounts).
         """
-        thread_msgs = self.fetch_thread(thread_id)
+        thread_msgs = self.fetch_thread(thread_id, with_body=False)
 
         has_newer_outbound = False
         has_newer_inbound = False
@@ -341,8 +479,6 @@ class GmailClient:
 
         Format matches get_email_history() output so format_email_history() works.
         """
-        from email.utils import parsedate_to_datetime
-
         service = self._get_service()
 
         try:
@@ -360,27 +496,22 @@ class GmailClient:
             return []
 
         history = []
-        for msg_id in msg_ids:
+        # Batched fetch (format=full includes headers + body)
+        for msg_id, raw in self._get_raw_messages(msg_ids).items():
             try:
-                # Single API call per message (format=full includes headers + body)
-                raw = service.users().messages().get(
-                    userId="me", id=msg_id, format="full",
-                ).execute()
+                if isinstance(raw, Exception):
+                    raise raw
 
-                headers = {h["name"].lower(): h["value"] for h in raw["payload"]["headers"]}
+                headers = self._pick_headers(raw["payload"], _HISTORY_HEADERS)
 
                 # Parse sender
                 from_raw = headers.get("from", "")
                 _, from_email = parseaddr(from_raw)
                 direction = "inbound" if from_email.lower() == client_email.lower().strip() else "outbound"
 
-                # Parse date
-                created_at = datetime.now(timezone.utc)
-                if headers.get("date"):
-                    try:
-                        created_at = parsedate_to_datetime(headers["date"])
-                    except Exception:
-                        pass
+                # internalDate (epoch ms) like get_message/fetch_thread — no
+                # RFC 2822 Date header parsing, and immune to sender clock skew
+                created_at = self._internal_date(raw)
 
                 history.append({
                     "client_email": client_email,
@@ -394,7 +525,8 @@ class GmailClient:
             except Exception as e:
                 logger.error("Failed to fetch message %s: %s", msg_id, e)
 
-        # Sort oldest first (Gmail returns newest first)
+        # Sort oldest first (Gmail returns newest first — a descending run
+        # that timsort just reverses in linear time)
         history.sort(key=lambda m: m["created_at"])
         return history
 
@@ -476,12 +608,11 @@ class GmailClient:
 
         msg_ids = [m["id"] for m in result.get("messages", [])]
         messages = []
-        for msg_id in msg_ids:
-            try:
-                msg = self.get_message(msg_id)
+        for msg_id, msg in self.get_messages(msg_ids).items():
+            if isinstance(msg, Exception):
+                logger.error("Failed to fetch order notification %s: %s", msg_id, msg)
+            else:
                 messages.append(msg)
-            except Exception as e:
-                logger.error("Failed to fetch order notification %s: %s", msg_id, e)
 
         logger.info(
             "Gmail order notifications for %s: %d found",
@@ -532,22 +663,52 @@ class GmailClient:
         logger.info("Gmail draft created: draft_id=%s, thread=%s, to=%s", draft_id, thread_id, to)
         return draft_id
 
+    @staticmethod
+    def _internal_date(msg: dict) -> datetime:
+        """Gmail internalDate (epoch ms) as an aware UTC datetime; now() if missing."""
+        internal_ms = msg.get("internalDate")
+        if internal_ms:
+            try:
+                return datetime.fromtimestamp(int(internal_ms) / 1000, tz=timezone.utc)
+            except (TypeError, ValueError, OverflowError):
+                pass
+        return datetime.now(timezone.utc)
+
+    @staticmethod
+    def _pick_headers(payload: dict, names: frozenset) -> dict:
+        """Collect the wanted headers (lower-cased names) in one scan.
+
+        Stops as soon as all names are found; the first occurrence wins.
+        """
+        found = {}
+        for h in payload.get("headers", ()):
+            name = h["name"].lower()
+            if name in names and name not in found:
+                found[name] = h["value"]
+                if len(found) == len(names):
+                    break
+        return found
+
     @staticmethod
     def _flatten_parts(payload: dict) -> list[dict]:
         """Recursively flatten all MIME parts from a Gmail payload.
 
         Returns [payload] itself for leaf payloads (no children).
         """
-        children = payload.get("parts", [])
+        return list(GmailClient._iter_parts(payload))
+
+    @staticmethod
+    def _iter_parts(payload: dict):
+        """Yield the leaf MIME parts of a payload depth-first, in document order."""
+        children = payload.get("parts")
         if not children:
-            return [payload]
-        parts = []
+            yield payload
+            return
         for part in children:
             if part.get("mimeType", "").startswith("multipart/"):
-                parts.extend(GmailClient._flatten_parts(part))
+                yield from GmailClient._iter_parts(part)
             else:
-                parts.append(part)
-        return parts
+                yield part
 
     @staticmethod
     def _extract_attachments_meta(payload: dict) -> list[dict]:
@@ -568,29 +729,40 @@ class GmailClient:
         Prefers text/plain but falls back to HTML→text conversion when
         text/plain is missing or just a stub ("does not support HTML").
         """
-        # Collect text/plain and text/html from all parts (recursive)
+        # Fast path: the whole body is one text/plain part (top-level or the
+        # only child). With no HTML to fall back to, it is the answer as is.
+        parts = payload.get("parts")
+        single = payload if not parts else (parts[0] if len(parts) == 1 else None)
+        if single is not None and single.get("mimeType") == "text/plain":
+            data = single.get("body", {}).get("data")
+            return self._decode_base64(data) if data else ""
+
+        # One depth-first walk: the first text/plain with real content (not
+        # just a stub) wins immediately; HTML is only decoded when it doesn't
         plain_text = None
-        html_text = None
-
-        all_parts = self._flatten_parts(payload)
+        html_data = None
 
-        for part in all_parts:
+        for part in self._iter_parts(payload):
             mime = part.get("mimeType", "")
-            data = part.get("body", {}).get("data")
-            if not data:
-                continue
-            if mime == "text/plain" and plain_text is None:
+            if mime == "text/plain":
+                if plain_text is not None:
+                    continue
+                data = part.get("body", {}).get("data")
+                if not data:
+                    continue
                 plain_text = self._decode_base64(data)
-            elif mime == "text/html" and html_text is None:
-                html_text = self._decode_base64(data)
-
-        # Use text/plain if it has real content (not just a stub)
-        if plain_text and "does not support html" not in plain_text.lower() and len(plain_text.strip()) > 20:
-            return plain_text
+                if "does not support html" not in plain_text.lower() and len(plain_text.strip()) > 20:
+                    return plain_text
+                if html_data:
+                    break
+            elif mime == "text/html" and not html_data:
+                html_data = part.get("body", {}).get("data")
+                if html_data and plain_text is not None:
+                    break
 
         # Otherwise convert HTML to plain text
-        if html_text:
-            return self._html_to_text(html_text)
+        if html_data:
+            return self._html_to_text(self._decode_base64(html_data))
 
         # Return whatever we have
         return plain_text or ""
@@ -622,4 +794,4 @@ class GmailClient:
     @staticmethod
     def _decode_base64(data: str) -> str:
         """Decode Gmail's URL-safe base64 encoded data."""
-        return base64.urlsafe_b64decode(data).decode("utf-8", errors="replace")
+        return _b64.urlsafe_b64decode(data).decode("utf-8", errors="replace")
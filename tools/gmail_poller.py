@@ -12,28 +12,56 @@ Usage:
     count = poll_gmail()  # returns number of processed messages
 """
 
+import base64
+import json
 import logging
 import threading
+import time
 from datetime import datetime, timedelta, timezone
 from os import getenv
 
-from agents.email_agent import classify_and_process
+from agents.email_agent import classify_and_process, classify_and_process_batch
 from db.memory import (
-    email_already_processed,
-    email_is_deferred,
+    emails_already_processed,
+    emails_processed_state,
     get_gmail_state,
+    save_emails_bulk,
     set_gmail_state,
 )
-from tools.gmail import GmailClient
+from tools.gmail import GMAIL_ACCOUNTS, GmailClient
 from utils.telegram import send_telegram
 
 logger = logging.getLogger(__name__)
 
 _gmail_clients: dict[str, GmailClient] = {}
 _poll_lock = threading.Lock()
+# Set by every poll_gmail() call; the lock holder re-runs the cycle while it
+# is set, so a trigger (push, manual) arriving mid-poll is not lost
+_poll_requested = threading.Event()
 _RECENT_UNREAD_WINDOW_DAYS = 14
 _MAX_MERGE_GAP_HOURS = 8  # Merge same-thread messages within this gap (covers overnight)
 
+# Gmail push: users.watch() → Pub/Sub topic → POST /api/gmail/push.
+# Watches expire after 7 days; renew_gmail_watches() re-arms them a day early.
+GMAIL_PUSH_TOPIC = getenv("GMAIL_PUSH_TOPIC", "")
+_WATCH_RENEW_MARGIN_MS = 24 * 3600 * 1000
+_watch_expirations: dict[str, int] = {}
+
+# Telegram HTML parse mode: escape &, < and > in dynamic content (one C-level pass)
+_HTML_ESCAPE = str.maketrans({"&": "&amp;", "<": "&lt;", ">": "&gt;"})
+
+# Telegram caps a message at 4096 characters counted after entity parsing
+# (&lt; is one character), so limits apply to the text before escaping —
+# truncating escaped text could also cut an entity in half.
+_RESULT_MAX_CHARS = 3500
+_SUBJECT_MAX_CHARS = 200
+
+# (header, label) for _send_telegram_result, keyed by "is hold result"
+_RESULT_HEADINGS = {
+    True: ("\u270b <b>Письмо отложено</b>", "Причина:"),
+    False: ("\U0001f4e8 <b>Новое письмо обработано!</b>", "Результат обработки:"),
+}
+
 
 def _get_client(account: str = "default") -> GmailClient:
     """Lazy singleton for GmailClient per account."""
@@ -72,21 +100,21 @@ from agents.formatters import format_combined_email_text as _format_combined_ema
 
 def _send_telegram_result(msg: dict, result: str) -> None:
     """Send formatted processing result to Telegram."""
-    now = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M UTC")
+    now = time.strftime("%Y-%m-%d %H:%M UTC", time.gmtime())
 
-    # Truncate result for Telegram (max 4096 chars)
-    if len(result) > 3500:
-        result = result[:3500] + "\n... (truncated)"
+    # Truncate for Telegram (max 4096 chars), then escape HTML special chars
+    if len(result) > _RESULT_MAX_CHARS:
+        result = result[:_RESULT_MAX_CHARS] + "\n... (truncated)"
+    subject = msg.get("subject", "") or ""
+    if len(subject) > _SUBJECT_MAX_CHARS:
+        subject = subject[:_SUBJECT_MAX_CHARS] + "..."
 
-    # Escape HTML special chars in dynamic content
-    subject = (msg.get("subject", "") or "").replace("<", "&lt;").replace(">", "&gt;")
-    from_addr = (msg.get("from", "") or "").replace("<", "&lt;").replace(">", "&gt;")
-    result_escaped = result.replace("<", "&lt;").replace(">", "&gt;")
+    subject = subject.translate(_HTML_ESCAPE)
+    from_addr = (msg.get("from", "") or "").translate(_HTML_ESCAPE)
+    result_escaped = result.translate(_HTML_ESCAPE)
 
     # Hold-aware header: detect hold results by prefix
-    is_hold = result.startswith("\u270b HOLD:")
-    header = "\u270b <b>Письмо отложено</b>" if is_hold else "\U0001f4e8 <b>Новое письмо обработано!</b>"
-    label = "Причина:" if is_hold else "Результат обработки:"
+    header, label = _RESULT_HEADINGS[result.startswith("\u270b HOLD:")]
 
     text = (
         f"{header}\n\n"
@@ -111,8 +139,6 @@ def process_client_email(client_email: str, account: str = "default", auto_mode:
 
     Returns the formatted result string (same as poll_gmail sends to Telegram).
     """
-    from tools.gmail import GMAIL_ACCOUNTS
-
     suffix = GMAIL_ACCOUNTS.get(account, "")
     if not getenv(f"GMAIL_REFRESH_TOKEN{suffix}", ""):
         return f"Gmail аккаунт '{account}' не настроен (нет GMAIL_REFRESH_TOKEN{suffix})."
@@ -133,23 +159,26 @@ def process_client_email(client_email: str, account: str = "default", auto_mode:
     if not unread:
         return f"Нет непрочитанных писем от {client_email}."
 
-    # Build message candidates with timestamps + deferred detection.
+    # Build message candidates with timestamps + deferred detection:
+    # one batched Gmail fetch and one history query for all of them.
+    msg_ids = [m["msg_id"] for m in unread]
+    fetched = client.get_messages(msg_ids)
+    processed_state = emails_processed_state(msg_ids)
     candidates = []
-    for msg_info in unread:
-        msg_id = msg_info["msg_id"]
-        try:
-            msg = client.get_message(msg_id)
-            _is_processed = email_already_processed(msg_id)
-            _is_deferred = email_is_deferred(msg_id) if _is_processed else False
-            candidates.append({
-                "msg_id": msg_id,
-                "msg": msg,
-                "created_at": msg.get("created_at"),
-                "processed": _is_processed and not _is_deferred,
-                "deferred": _is_deferred,
-            })
-        except Exception as e:
-            logger.error("Failed to load unread message %s: %s", msg_id, e, exc_info=True)
+    for msg_id in msg_ids:
+        msg = fetched.get(msg_id)
+        if msg is None or isinstance(msg, Exception):
+            logger.error("Failed to load unread message %s: %s", msg_id, msg,
+                         exc_info=msg if isinstance(msg, Exception) else None)
+            continue
+        _is_deferred = processed_state.get(msg_id, False)
+        candidates.append({
+            "msg_id": msg_id,
+            "msg": msg,
+            "created_at": msg.get("created_at"),
+            "processed": msg_id in processed_state and not _is_deferred,
+            "deferred": _is_deferred,
+        })
 
     if not candidates:
         return f"Не удалось прочитать непрочитанные письма от {client_email}."
@@ -189,7 +218,7 @@ def process_client_email(client_email: str, account: str = "default", auto_mode:
 
             # Fetch thread snapshot once per thread_id
             if dc_thread not in _thread_snapshots:
-                _thread_snapshots[dc_thread] = client.fetch_thread(dc_thread)
+                _thread_snapshots[dc_thread] = client.fetch_thread(dc_thread, with_body=False)
 
             # Evaluate THIS specific deferred message against the snapshot
             snapshot = _thread_snapshots[dc_thread]
@@ -241,17 +270,18 @@ def process_client_email(client_email: str, account: str = "default", auto_mode:
         # don't get picked up on the next trigger.
         stale_thread = [c for c in thread_msgs if _dt_key(c) < merge_cutoff]
         if stale_thread:
-            from db.email_history import save_email
-            for c in stale_thread:
-                save_email(
-                    client_email=client_email,
-                    direction="inbound",
-                    subject=c["msg"].get("subject", ""),
-                    body="(stale unread — skipped, outside merge window)",
-                    situation="skipped_stale",
-                    gmail_message_id=c["msg_id"],
-                    gmail_thread_id=primary_thread,
-                )
+            save_emails_bulk([
+                {
+                    "client_email": client_email,
+                    "direction": "inbound",
+                    "subject": c["msg"].get("subject", ""),
+                    "body": "(stale unread — skipped, outside merge window)",
+                    "situation": "skipped_stale",
+                    "gmail_message_id": c["msg_id"],
+                    "gmail_thread_id": primary_thread,
+                }
+                for c in stale_thread
+            ])
             logger.info(
                 "Skipped %d stale same-thread messages (older than %dh from newest)",
                 len(stale_thread), _MAX_MERGE_GAP_HOURS,
@@ -272,24 +302,28 @@ def process_client_email(client_email: str, account: str = "default", auto_mode:
             gmail_thread_id=primary_thread,
             gmail_account=account,
             auto_mode=auto_mode,
+            # Explicit reprocess: a cached (possibly wrong) classification
+            # must not be replayed
+            bypass_cache=True,
         )
         _send_telegram_result(primary["msg"], result)
 
         # Mark extra same-thread messages as processed so they aren't
         # picked up again on the next trigger.
         if len(same_thread) > 1:
-            from db.email_history import save_email
-            for c in same_thread:
-                if c["msg_id"] != primary["msg_id"]:
-                    save_email(
-                        client_email=client_email,
-                        direction="inbound",
-                        subject=c["msg"].get("subject", ""),
-                        body="(merged into combined processing)",
-                        situation="merged",
-                        gmail_message_id=c["msg_id"],
-                        gmail_thread_id=primary_thread,
-                    )
+            save_emails_bulk([
+                {
+                    "client_email": client_email,
+                    "direction": "inbound",
+                    "subject": c["msg"].get("subject", ""),
+                    "body": "(merged into combined processing)",
+                    "situation": "merged",
+                    "gmail_message_id": c["msg_id"],
+                    "gmail_thread_id": primary_thread,
+                }
+                for c in same_thread
+                if c["msg_id"] != primary["msg_id"]
+            ])
 
         return result
     except Exception as e:
@@ -310,26 +344,89 @@ def poll_gmail() -> int:
     """Poll Gmail for new messages on all configured accounts.
 
     Returns total number of processed messages.
-    Thread-safe: only one poll can run at a time.
+    Thread-safe: only one poll runs at a time. A call made while a poll is
+    running returns 0 at once and the running poll does one more cycle.
+    """
+    # Concurrent triggers (background loop, manual, push) are coalesced: a
+    # call that finds a poll running leaves a request for the holder to serve
+    _poll_requested.set()
+    total = 0
+    while True:
+        if not _poll_lock.acquire(blocking=False):
+            logger.info("Gmail poll already running, re-run requested")
+            return total
+
+        try:
+            while _poll_requested.is_set():
+                _poll_requested.clear()
+                total += _poll_cycle()
+        finally:
+            _poll_lock.release()
+
+        # A request that landed between the last check and release
+        if not _poll_requested.is_set():
+            return total
+
+
+def _poll_cycle() -> int:
+    """One poll of every configured account (must be called under _poll_lock)."""
+    total = 0
+    # Poll default account
+    if getenv("GMAIL_REFRESH_TOKEN", ""):
+        total += _poll_gmail_locked("default")
+    # Poll tilda account
+    if getenv("GMAIL_REFRESH_TOKEN_TILDA", ""):
+        total += _poll_gmail_locked("tilda")
+    # Auto-reprocess: check if any deferred emails now have clients in DB
+    total += _reprocess_deferred_with_known_clients()
+    return total
+
+
+def renew_gmail_watches(topic: str = GMAIL_PUSH_TOPIC) -> int:
+    """Start Gmail push watches that are missing or expire within a day.
+
+    Called from the poll loop; a no-op when no topic is configured.
+    Returns number of watches (re)started.
     """
-    # Prevent concurrent runs (background loop + manual trigger)
-    if not _poll_lock.acquire(blocking=False):
-        logger.info("Gmail poll already running, skipping")
+    if not topic:
         return 0
 
+    now_ms = int(time.time() * 1000)
+    renewed = 0
+    for account, suffix in GMAIL_ACCOUNTS.items():
+        if not getenv(f"GMAIL_REFRESH_TOKEN{suffix}", ""):
+            continue
+        if _watch_expirations.get(account, 0) - now_ms > _WATCH_RENEW_MARGIN_MS:
+            continue
+        try:
+            response = _get_client(account=account).watch(topic)
+            _watch_expirations[account] = int(response["expiration"])
+            renewed += 1
+            logger.info("Gmail watch started for %s (expires %s)", account, response["expiration"])
+        except Exception as e:
+            logger.error("Gmail watch failed for %s: %s", account, e)
+    return renewed
+
+
+def handle_push_notification(envelope: dict) -> int:
+    """Handle a Pub/Sub push delivery from a Gmail watch.
+
+    The notification only says that a mailbox changed ({emailAddress,
+    historyId}). poll_gmail() reads history from each account's stored
+    position, so one poll cycle picks up everything announced.
+
+    Returns number of processed messages.
+    """
+    data = (envelope.get("message") or {}).get("data", "")
     try:
-        total = 0
-        # Poll default account
-        if getenv("GMAIL_REFRESH_TOKEN", ""):
-            total += _poll_gmail_locked("default")
-        # Poll tilda account
-        if getenv("GMAIL_REFRESH_TOKEN_TILDA", ""):
-            total += _poll_gmail_locked("tilda")
-        # Auto-reprocess: check if any deferred emails now have clients in DB
-        total += _reprocess_deferred_with_known_clients()
-        return total
-    finally:
-        _poll_lock.release()
+        payload = json.loads(base64.b64decode(data)) if data else {}
+    except ValueError:
+        payload = {}
+    logger.info(
+        "Gmail push notification: %s historyId=%s",
+        payload.get("emailAddress", "?"), payload.get("historyId", "?"),
+    )
+    return poll_gmail()
 
 
 def _reprocess_deferred_with_known_clients() -> int:
@@ -371,6 +468,32 @@ def _reprocess_deferred_with_known_clients() -> int:
     return reprocessed
 
 
+def _process_fetched_messages(batch: list[tuple[str, dict]], account: str) -> int:
+    """Run fetched (msg_id, msg) pairs through the pipeline and report to Telegram.
+
+    One poll cycle's messages are classified together; processing and
+    Telegram reports still happen one message at a time, in order.
+    Returns number of processed messages.
+    """
+    if not batch:
+        return 0
+    results = classify_and_process_batch(
+        [
+            {
+                "email_text": _format_email_text(msg),
+                "gmail_message_id": msg_id,
+                "gmail_thread_id": msg.get("gmail_thread_id"),
+            }
+            for msg_id, msg in batch
+        ],
+        gmail_account=account,
+        auto_mode=True,
+    )
+    for (_, msg), result in zip(batch, results):
+        _send_telegram_result(msg, result)
+    return len(batch)
+
+
 def _poll_gmail_locked(account: str = "default") -> int:
     """Internal poll logic for a single account (must be called under _poll_lock)."""
     client = _get_client(account=account)
@@ -394,24 +517,15 @@ def _poll_gmail_locked(account: str = "default") -> int:
                     f"\u2705 <b>{account_label}Gmail poller запущен!</b>\n\n"
                     f"Найдено {len(unread)} непрочитанных писем (Primary), обрабатываю..."
                 )
-                for msg_info in unread:
-                    msg_id = msg_info["msg_id"]
-                    if email_already_processed(msg_id):
+                batch = []
+                done = emails_already_processed([m["msg_id"] for m in unread])
+                pending = [m["msg_id"] for m in unread if m["msg_id"] not in done]
+                for msg_id, msg in (client.get_messages(pending) if pending else {}).items():
+                    if isinstance(msg, Exception):
+                        logger.error("Failed to process unread message %s: %s", msg_id, msg, exc_info=msg)
                         continue
-                    try:
-                        msg = client.get_message(msg_id)
-                        email_text = _format_email_text(msg)
-                        result = classify_and_process(
-                            email_text,
-                            gmail_message_id=msg_id,
-                            gmail_thread_id=msg.get("gmail_thread_id"),
-                            gmail_account=account,
-                            auto_mode=True,
-                        )
-                        _send_telegram_result(msg, result)
-                        processed += 1
-                    except Exception as e:
-                        logger.error("Failed to process unread message %s: %s", msg_id, e, exc_info=True)
+                    batch.append((msg_id, msg))
+                processed += _process_fetched_messages(batch, account)
             else:
                 send_telegram(
                     f"\u2705 <b>{account_label}Gmail poller запущен!</b>\n\n"
@@ -430,51 +544,47 @@ def _poll_gmail_locked(account: str = "default") -> int:
         logger.info("%sFound %d new Gmail messages", account_label, len(new_messages))
 
         latest_history_id = history_id
+        pending = []
+        pending_ids = set()
+        # Deduplication: one query for the whole cycle
+        done = emails_already_processed([m["msg_id"] for m in new_messages])
 
         for msg_info in new_messages:
             msg_id = msg_info["msg_id"]
 
-            # Deduplication check
-            if email_already_processed(msg_id):
+            if msg_id in done or msg_id in pending_ids:
                 logger.debug("Skipping already processed message: %s", msg_id)
                 continue
+            pending.append(msg_id)
+            pending_ids.add(msg_id)
 
-            try:
-                # Fetch full message
-                msg = client.get_message(msg_id)
-                logger.info(
-                    "Processing Gmail message: from=%s, subject=%s",
-                    msg["from"], msg["subject"],
-                )
-
-                # Format for classify_and_process
-                email_text = _format_email_text(msg)
-
-                # Process through email agent pipeline
-                result = classify_and_process(
-                    email_text,
-                    gmail_message_id=msg_id,
-                    gmail_thread_id=msg.get("gmail_thread_id"),
-                    gmail_account=account,
-                    auto_mode=True,
-                )
-
-                # Send result to Telegram
-                _send_telegram_result(msg, result)
-
-                processed += 1
+            # Update history_id after each message
+            if msg_info.get("history_id"):
+                latest_history_id = msg_info["history_id"]
 
-            except Exception as e:
-                logger.error("Failed to process message %s: %s", msg_id, e, exc_info=True)
+        # Fetch full messages in batched API calls
+        batch = []
+        fetched = client.get_messages(pending) if pending else {}
+        for msg_id in pending:
+            msg = fetched.get(msg_id)
+            if msg is None or isinstance(msg, Exception):
+                error = msg or "message not returned by Gmail"
+                logger.error("Failed to process message %s: %s", msg_id, error,
+                             exc_info=msg if isinstance(msg, Exception) else None)
                 send_telegram(
                     f"\U0001f6a8 <b>Ошибка обработки Gmail!</b>\n\n"
                     f"Message ID: {msg_id}\n"
-                    f"Ошибка: {e}"
+                    f"Ошибка: {error}"
                 )
+                continue
+            logger.info(
+                "Processing Gmail message: from=%s, subject=%s",
+                msg["from"], msg["subject"],
+            )
+            batch.append((msg_id, msg))
 
-            # Update history_id after each message
-            if msg_info.get("history_id"):
-                latest_history_id = msg_info["history_id"]
+        # Process through email agent pipeline (classifier calls shared)
+        processed += _process_fetched_messages(batch, account)
 
         # Save latest history_id
         if latest_history_id != history_id:
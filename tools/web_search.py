@@ -4,11 +4,13 @@ Abstraction over web search — swap provider without changing agents.
 Currently uses DuckDuckGo (free, no API key).
 """
 
-from agno.tools.duckduckgo import DuckDuckGoTools
-
 
 def get_search_tools():
     """Return web search tools for agents."""
+    # Provider imported on first use — modules that only import this layer
+    # (or stub it in tests) don't load the search toolkit.
+    from agno.tools.duckduckgo import DuckDuckGoTools
+
     return DuckDuckGoTools(
         enable_search=True,
         enable_news=False,
@@ -4,13 +4,19 @@ Telegram Notifications
 
 Send notifications to Telegram via Bot API.
 Uses httpx (already installed as dependency of agno/openai).
+Messages are queued and sent by a background thread, so callers never
+wait on the Telegram API.
 
 Usage:
     from utils.telegram import send_telegram
     send_telegram("Hello from AgentOS!")
 """
 
+import atexit
 import logging
+import queue
+import threading
+import time
 from os import getenv
 
 import httpx
@@ -22,38 +28,141 @@ TELEGRAM_CHAT_ID = getenv("TELEGRAM_CHAT_ID", "")
 
 API_URL = "https://api.telegram.org/bot{token}/sendMessage"
 
+# Pending (message, parse_mode) sends. Callers (poller, pipeline) never wait
+# on Telegram; when the bot API is down, the oldest notifications are dropped.
+_QUEUE_MAXSIZE = 1024
+_queue: queue.Queue[tuple[str, str]] = queue.Queue(maxsize=_QUEUE_MAXSIZE)
+# Backoff before each retry of a failed send (network error, 429, 5xx)
+_RETRY_DELAYS = (1, 4)
+# How long interpreter exit waits for queued notifications
+_SHUTDOWN_TIMEOUT = 5
+
+# One pooled client for all notifications — keeps the TLS connection to
+# api.telegram.org alive between sends. Created on first send.
+_client: httpx.Client | None = None
+_client_lock = threading.Lock()
+
+_worker: threading.Thread | None = None
+_worker_lock = threading.Lock()
+
+
+def _get_client() -> httpx.Client:
+    """Return the shared Telegram HTTP client, creating it on first use."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = httpx.Client(
+                    http2=True,
+                    timeout=10,
+                    limits=httpx.Limits(max_keepalive_connections=4),
+                )
+    return _client
+
+
+def _post(message: str, parse_mode: str) -> bool:
+    """POST one message, retrying transient failures. True if delivered."""
+    for attempt in range(len(_RETRY_DELAYS) + 1):
+        if attempt:
+            time.sleep(_RETRY_DELAYS[attempt - 1])
+        try:
+            response = _get_client().post(
+                API_URL.format(token=TELEGRAM_BOT_TOKEN),
+                json={
+                    "chat_id": TELEGRAM_CHAT_ID,
+                    "text": message,
+                    "parse_mode": parse_mode,
+                },
+            )
+        except httpx.TransportError as e:
+            logger.warning("Telegram send failed (attempt %d): %s", attempt + 1, e)
+            continue
+        except Exception as e:
+            logger.error("Telegram send failed: %s", e)
+            return False
+
+        if response.status_code == 200:
+            logger.info("Telegram notification sent")
+            return True
+        if response.status_code != 429 and response.status_code < 500:
+            logger.error("Telegram API error: %s %s", response.status_code, response.text)
+            return False
+        logger.warning("Telegram API error (attempt %d): %s", attempt + 1, response.status_code)
+
+    logger.error("Telegram notification dropped after %d attempts", len(_RETRY_DELAYS) + 1)
+    return False
+
+
+def _drain() -> None:
+    """Worker loop: send queued notifications one at a time, in order."""
+    while True:
+        message, parse_mode = _queue.get()
+        try:
+            _post(message, parse_mode)
+        finally:
+            _queue.task_done()
+
+
+def _ensure_worker() -> None:
+    """Start the send worker on first use."""
+    global _worker
+    if _worker is not None:
+        return
+    with _worker_lock:
+        if _worker is None:
+            _worker = threading.Thread(target=_drain, name="telegram-sender", daemon=True)
+            _worker.start()
+            atexit.register(_shutdown)
+
+
+def flush(timeout: float | None = None) -> bool:
+    """Wait until every queued notification has been sent (or given up on).
+
+    Returns:
+        True if the queue drained, False on timeout.
+    """
+    deadline = None if timeout is None else time.monotonic() + timeout
+    with _queue.all_tasks_done:
+        while _queue.unfinished_tasks:
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                return False
+            _queue.all_tasks_done.wait(remaining)
+    return True
+
+
+def _shutdown() -> None:
+    if not flush(_SHUTDOWN_TIMEOUT):
+        logger.warning("Telegram: %d notifications not sent at exit", _queue.qsize())
+    if _client is not None:
+        _client.close()
+
 
 def send_telegram(message: str, parse_mode: str = "HTML") -> bool:
-    """Send a message to Telegram.
+    """Queue a message for Telegram; a background worker sends it.
 
     Args:
         message: Text to send (supports HTML formatting).
         parse_mode: "HTML" or "Markdown". Default "HTML".
 
     Returns:
-        True if sent successfully, False otherwise.
-        Never raises — notifications must not break the main flow.
+        True if queued, False if Telegram is not configured.
+        Never raises or blocks — notifications must not break the main flow.
+        Delivery failures are logged by the worker.
     """
     if not TELEGRAM_BOT_TOKEN or not TELEGRAM_CHAT_ID:
         logger.warning("Telegram not configured (TELEGRAM_BOT_TOKEN or TELEGRAM_CHAT_ID missing)")
         return False
 
-    try:
-        response = httpx.post(
-            API_URL.format(token=TELEGRAM_BOT_TOKEN),
-            json={
-                "chat_id": TELEGRAM_CHAT_ID,
-                "text": message,
-                "parse_mode": parse_mode,
-            },
-            timeout=10,
-        )
-        if response.status_code == 200:
-            logger.info("Telegram notification sent")
+    _ensure_worker()
+    while True:
+        try:
+            _queue.put_nowait((message, parse_mode))
             return True
-        else:
-            logger.error("Telegram API error: %s %s", response.status_code, response.text)
-            return False
-    except Exception as e:
-        logger.error("Telegram send failed: %s", e)
-        return False
+        except queue.Full:
+            try:
+                _queue.get_nowait()
+                _queue.task_done()
+                logger.warning("Telegram queue full (%d): dropped oldest notification", _QUEUE_MAXSIZE)
+            except queue.Empty:
+                pass